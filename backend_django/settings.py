@@ -14,6 +14,7 @@ import os
 from pathlib import Path
 import environ
 import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -127,6 +128,22 @@ else:
     }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Cached results are invalidated by bumping version tokens in the cache (see matches/cache.py),
+# so outside DEBUG the cache must be shared by every worker and management command:
+# the database cache (dbcache://django_cache, created by build.sh) or Redis (rediscache://...)
+
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://' if DEBUG else 'dbcache://django_cache'),
+}
+if not DEBUG and CACHES['default']['BACKEND'] in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+):
+    raise ImproperlyConfigured("CACHE_URL must point to a cache shared by every process (dbcache:// or rediscache://) when DEBUG is off")
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -221,6 +238,9 @@ EMAIL_NOTIFICATIONS_ADDRESS = env.list('EMAIL_NOTIFICATIONS_ADDRESS', default=[]
 FRONTEND_URL_BASE = env('FRONTEND_URL_BASE', default='http://localhost:3000')
 ADMIN_URL_BASE = env('ADMIN_URL_BASE', default='http://localhost:8000/admin')
 
+# default length in minutes of the stadium slot booked by a match
+MATCH_SLOT_MINUTES = env.int('MATCH_SLOT_MINUTES', default=90)
+
 #strapi settings
 STRIPE_SECRET_KEY = env('STRIPE_SECRET_KEY')
 
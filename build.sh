@@ -6,4 +6,8 @@ pip install --upgrade pip
 pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+python manage.py createcachetable
+python manage.py rebuild_standings
+python manage.py rebuild_discipline
+python manage.py rebuild_ratings
@@ -1,7 +1,13 @@
 from django.contrib import admin
-from .models import LocalLeague, Match, MatchEvent, News, Partner, Stadium, Staff, Team, Player, TeamParticipationMatch
+from .models import BlackoutDate, LocalLeague, Match, MatchEvent, News, Partner, Stadium, Staff, Suspension, Team, Player, TeamParticipationMatch, MAX_MATCH_DURATION, default_match_duration
 from nested_admin import NestedStackedInline, NestedModelAdmin, NestedTabularInline
 from django import forms
+from django.contrib import messages
+from django.contrib.admin import helpers
+from django.template.response import TemplateResponse
+from .fixtures import FixtureError, generate_fixtures
+from django.utils.html import format_html, format_html_join
+from .tiebreakers import rank_teams
 
 
 # inlines for many-to-many relationships
@@ -112,6 +118,14 @@ class LocalLeagueForm(forms.ModelForm):
             instance.save()
         return instance
 
+class FixtureGenerationForm(forms.Form):
+    start = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}), label="First matchday")
+    kickoff = forms.TimeField(initial="20:00", widget=forms.TimeInput(attrs={'type': 'time'}), label="First kick-off of a day")
+    interval = forms.IntegerField(min_value=1, initial=7, label="Days between rounds")
+    slot = forms.IntegerField(min_value=1, max_value=MAX_MATCH_DURATION, initial=default_match_duration, label="Minutes between matches in the same stadium")
+    double = forms.BooleanField(required=False, label="Double round-robin (home and away)")
+    replace = forms.BooleanField(required=False, label="Replace the scheduled group stage matches")
+
 @admin.register(LocalLeague)
 class LocalLeagueAdmin(admin.ModelAdmin):
     list_display = ('slug', 'name', 'title', 'subtitle', 'logo')
@@ -125,19 +139,80 @@ class LocalLeagueAdmin(admin.ModelAdmin):
         ('Page Info', {
             'fields': ('title', 'subtitle', 'instagram', 'tiktok', 'logo', 'background'),
         }),
+        ('Discipline', {
+            'fields': ('yellow_cards_threshold', 'yellow_cards_suspension', 'red_card_suspension'),
+            'classes': ['collapse'],
+        }),
+        ('Standings', {
+            'fields': ('tiebreakers', 'qualifying_teams', 'standings_table'),
+            'classes': ['collapse'],
+        }),
     )
+    readonly_fields = ('standings_table',)
+    actions = ['generate_fixtures']
     inlines = (StaffLocalLeagueInline, PartnerLocalLeagueInline, StadiumLocalLeagueInline, TeamLocalLeagueInline,)
     form = LocalLeagueForm
 
+    @admin.action(description="Generate the group stage round-robin")
+    def generate_fixtures(self, request, queryset):
+        form = FixtureGenerationForm(request.POST if 'apply' in request.POST else None)
+        if form.is_valid():
+            options = dict(form.cleaned_data)
+            start = options.pop('start')
+            for local_league in queryset:
+                try:
+                    created = generate_fixtures(local_league, start, **options)
+                except FixtureError as e:
+                    self.message_user(request, str(e), messages.ERROR)
+                else:
+                    self.message_user(request, f"Created {created} matches for {local_league.name}.", messages.SUCCESS)
+            return None
+        return TemplateResponse(request, 'admin/matches/generate_fixtures.html', {
+            **self.admin_site.each_context(request),
+            'title': "Generate the group stage round-robin",
+            'form': form,
+            'queryset': queryset,
+            'opts': self.model._meta,
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        })
+
+    @admin.display(description="Group stage table")
+    def standings_table(self, obj):
+        if obj.pk is None:
+            return "-"
+        teams = rank_teams(Team.objects.filter(local_league=obj).with_standings('Gironi'), obj, 'Gironi')
+        return format_html(
+            "<table><tr><th>#</th><th>Team</th><th>Pld</th><th>Pts</th><th>GD</th><th>GF</th></tr>{}</table>",
+            format_html_join("", "<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>", (
+                (position, team.name, team.played, team.points, team.goal_difference, team.goals_for)
+                for position, team in enumerate(teams, start=1)
+            )),
+        )
+
 @admin.register(Team)
 class TeamAdmin(admin.ModelAdmin):
-    list_display = ('slug', 'name', 'short_name', 'coach', 'local_league__name', 'logo', "pts")
+    list_display = ('slug', 'name', 'short_name', 'coach', 'local_league__name', 'logo', 'played', 'points', 'goal_difference', 'rating')
     search_fields = ('slug', 'name', 'short_name', 'local_league__name')
     prepopulated_fields = {'slug': ('name',)}
     list_editable = ("name", "short_name", 'coach')
     list_filter = ('local_league__name',)
     inlines = (PlayerTeamInline,)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('local_league').with_standings('Gironi')
+
+    @admin.display(description="Played", ordering='played')
+    def played(self, obj):
+        return obj.played
+
+    @admin.display(description="Pts", ordering='points')
+    def points(self, obj):
+        return obj.points
+
+    @admin.display(description="Goal difference", ordering='goal_difference')
+    def goal_difference(self, obj):
+        return obj.goal_difference
+
 @admin.register(Player)
 class PlayerAdmin(admin.ModelAdmin):
     list_display = ('id', 'last_name', 'first_name', 'shirt_number', 'position', 'team__name')
@@ -164,7 +239,7 @@ class MatchAdmin(NestedModelAdmin):
     list_filter = ('teams__local_league__name',)
     fieldsets = (
         ('General Info', {
-            'fields': ('datetime', 'stadium', 'stage', ('score_computation_mode', 'status')),
+            'fields': (('datetime', 'duration'), 'stadium', 'stage', ('score_computation_mode', 'status')),
         }),
         ('Registration', {
             'fields': ('registration_required', 'registration_link'),
@@ -173,6 +248,20 @@ class MatchAdmin(NestedModelAdmin):
     )
     inlines = (TeamParticipationMatchInline,)
 
+    def get_queryset(self, request):
+        # name and score_text are computed from the prefetched participations
+        return super().get_queryset(request).select_related('stadium').prefetch_related('participations__team')
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'stadium':
+            # the list_editable stadium widget is built once per row: share its choices across the request
+            choices = getattr(request, '_stadium_choices', None)
+            if choices is None:
+                choices = request._stadium_choices = list(formfield.choices)
+            formfield.choices = choices
+        return formfield
+
 @admin.register(News)
 class NewsAdmin(admin.ModelAdmin):
     list_display = ('id', 'title', 'date', 'local_league')
@@ -180,3 +269,25 @@ class NewsAdmin(admin.ModelAdmin):
     list_filter = ('local_league__name',)
     list_editable = ('title', 'date', 'local_league')
     prepopulated_fields = {'slug': ('title',)}
+
+@admin.register(Suspension)
+class SuspensionAdmin(admin.ModelAdmin):
+    list_display = ('player', 'team__name', 'reason', 'matches', 'starts_after', 'ends_at')
+    list_filter = ('local_league__name', 'reason')
+    search_fields = ('player__first_name', 'player__last_name', 'team__name')
+    list_select_related = ('player__team', 'team')
+
+    # suspensions are computed from the card events, see matches.discipline
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(BlackoutDate)
+class BlackoutDateAdmin(admin.ModelAdmin):
+    list_display = ('team', 'stadium', 'start_date', 'end_date', 'reason')
+    list_filter = ('team__local_league__name',)
+    search_fields = ('team__name', 'stadium__name', 'reason')
+    list_select_related = ('team__local_league', 'stadium')
+    autocomplete_fields = ('team', 'stadium')
@@ -0,0 +1,100 @@
+from django.db.models import Count, ExpressionWrapper, F, IntegerField, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .cache import cached
+from .models import MatchEvent, TeamParticipationMatch
+
+BUCKET_MINUTES = 15
+
+
+def goals_by_minute(events):
+    """Goals per 15 minute bucket, split between home and away teams, from one grouped query."""
+    rows = events.filter(event_type='GOAL').annotate(
+        bucket=ExpressionWrapper(F('minute') / BUCKET_MINUTES, output_field=IntegerField()),
+    ).values('bucket', 'team_match__is_home').annotate(goals=Count('id')).order_by('bucket')
+    buckets = {}
+    for row in rows:
+        bucket = row['bucket']
+        if bucket not in buckets:
+            buckets[bucket] = {
+                'from': bucket * BUCKET_MINUTES if bucket is not None else None,
+                'to': bucket * BUCKET_MINUTES + BUCKET_MINUTES - 1 if bucket is not None else None,
+                'home': 0,
+                'away': 0,
+            }
+        buckets[bucket]['home' if row['team_match__is_home'] else 'away'] += row['goals']
+    # goals without a minute come last
+    return sorted(buckets.values(), key=lambda bucket: (bucket['from'] is None, bucket['from'] or 0))
+
+
+def home_advantage(local_league_id, stage):
+    """
+    Results and goals of the finished matches seen from the home team, from one aggregate query:
+    each home participation is joined to the away participation of the same match.
+    """
+    matches = TeamParticipationMatch.objects.filter(
+        is_home=True,
+        match__status='FT',
+        team__local_league_id=local_league_id,
+        match__participations__is_home=False,
+    )
+    if stage:
+        matches = matches.filter(match__stage=stage)
+    away_score, away_penalties = F('match__participations__score'), F('match__participations__penalties')
+    tied = Q(score=away_score)
+    totals = matches.aggregate(
+        played=Count('id'),
+        home_wins=Count('id', filter=Q(score__gt=away_score)),
+        away_wins=Count('id', filter=Q(score__lt=away_score)),
+        home_penalty_wins=Count('id', filter=tied & Q(penalties__gt=away_penalties)),
+        away_penalty_wins=Count('id', filter=tied & Q(penalties__lt=away_penalties)),
+        home_goals=Coalesce(Sum('score'), 0),
+        away_goals=Coalesce(Sum(away_score), 0),
+    )
+    played = totals['played']
+    totals['draws'] = played - totals['home_wins'] - totals['away_wins'] - totals['home_penalty_wins'] - totals['away_penalty_wins']
+
+    def rate(value):
+        return round(value / played, 3) if played else None
+
+    return {
+        **totals,
+        'home_win_rate': rate(totals['home_wins'] + totals['home_penalty_wins']),
+        'away_win_rate': rate(totals['away_wins'] + totals['away_penalty_wins']),
+        'average_goals': rate(totals['home_goals'] + totals['away_goals']),
+        'average_home_goals': rate(totals['home_goals']),
+        'average_away_goals': rate(totals['away_goals']),
+    }
+
+
+def cards_by_team(events):
+    """Yellow and red cards of each team, from one grouped query, most carded teams first."""
+    rows = events.filter(event_type__in=['YELLOW_CARD', 'RED_CARD']).values(
+        'team_match__team__slug', 'team_match__team__name',
+    ).annotate(
+        yellow_cards=Count('id', filter=Q(event_type='YELLOW_CARD')),
+        red_cards=Count('id', filter=Q(event_type='RED_CARD')),
+    ).order_by('-red_cards', '-yellow_cards', 'team_match__team__name')
+    return [{
+        'team': {'slug': row['team_match__team__slug'], 'name': row['team_match__team__name']},
+        'yellow_cards': row['yellow_cards'],
+        'red_cards': row['red_cards'],
+    } for row in rows]
+
+
+def compute_analytics(local_league_id, stage=None):
+    """Statistics of a local league, optionally restricted to a stage, computed with three grouped queries."""
+    events = MatchEvent.objects.filter(team_match__team__local_league_id=local_league_id)
+    if stage:
+        events = events.filter(team_match__match__stage=stage)
+    return {
+        'stage': stage,
+        'goals_by_minute': goals_by_minute(events),
+        'home_advantage': home_advantage(local_league_id, stage),
+        'cards_by_team': cards_by_team(events),
+    }
+
+
+def league_analytics(local_league_id, stage=None):
+    """Cached statistics of a local league, invalidated when one of its matches or events changes."""
+    return cached('league', local_league_id, f"analytics:{stage}", lambda: compute_analytics(local_league_id, stage))
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from .cache import cached
+from .models import Match, TeamParticipationMatch
+
+
+def participant(p):
+    return {
+        'slug': p.team.slug,
+        'name': p.team.name,
+        'short_name': p.team.short_name,
+        'score': p.score,
+        'penalties': p.penalties,
+    }
+
+
+def compute_bracket(local_league_id):
+    """
+    Knockout bracket of a local league, built from the participations of its knockout matches in a single query.
+    A match feeds the match of the following round in which its winner plays; the matches of each round are
+    ordered so that the two matches feeding the same next match are adjacent.
+    """
+    participations = TeamParticipationMatch.objects.filter(
+        match__stage__in=Match.KNOCKOUT_STAGES,
+        team__local_league_id=local_league_id,
+    ).select_related('match', 'team').order_by('match__datetime', 'match_id', '-is_home')
+
+    matches = {}
+    sides = defaultdict(list)
+    for p in participations:
+        matches[p.match_id] = p.match
+        sides[p.match_id].append(p)
+
+    nodes = {}
+    rounds = defaultdict(list)
+    for match_id, match in matches.items():
+        home = next((p for p in sides[match_id] if p.is_home), None)
+        away = next((p for p in sides[match_id] if not p.is_home), None)
+        winner = None
+        if match.finished and home and away:
+            result = home.result_against(away)
+            if result in ('REGULAR_WIN', 'PENALTY_WIN'):
+                winner = home
+            elif result in ('REGULAR_LOSS', 'PENALTY_LOSS'):
+                winner = away
+        nodes[match_id] = {
+            'id': match_id,
+            'stage': match.stage,
+            'datetime': match.datetime,
+            'status': match.status,
+            'home': participant(home) if home else None,
+            'away': participant(away) if away else None,
+            'winner': winner.team.slug if winner else None,
+            'next_match': None,
+            'previous_matches': [],
+        }
+        rounds[match.stage].append(nodes[match_id])
+
+    stages = [stage for stage in Match.KNOCKOUT_STAGES if rounds[stage]]
+    for stage, next_stage in zip(stages, stages[1:]):
+        next_by_team = {}
+        for node in rounds[next_stage]:
+            for side in ('home', 'away'):
+                if node[side]:
+                    next_by_team[node[side]['slug']] = node
+        for node in rounds[stage]:
+            next_node = next_by_team.get(node['winner'])
+            if next_node:
+                node['next_match'] = next_node['id']
+                next_node['previous_matches'].append(node['id'])
+
+    # order each round after the following one, so that sibling matches are adjacent
+    for stage, next_stage in reversed(list(zip(stages, stages[1:]))):
+        positions = {node['id']: position for position, node in enumerate(rounds[next_stage])}
+        rounds[stage].sort(key=lambda node: positions.get(node['next_match'], len(positions)))
+
+    return {'rounds': [{'stage': stage, 'matches': rounds[stage]} for stage in stages]}
+
+
+def league_bracket(local_league_id):
+    """Cached knockout bracket of a local league, invalidated when one of its knockout matches changes."""
+    return cached('knockout', local_league_id, 'bracket', lambda: compute_bracket(local_league_id))
@@ -0,0 +1,64 @@
+import hashlib
+import uuid
+
+from django.core.cache import cache
+
+# Cached results are stored under the version token of the scope they are computed from
+# (a local league, a team, a match...). Bumping a scope replaces its token, so results computed
+# from stale data are never read again and simply expire.
+
+DEFAULT_TIMEOUT = 60 * 60
+
+
+def _version_key(scope, key):
+    return f"matches:version:{scope}:{key}"
+
+
+def get_version(scope, key):
+    """Returns the current version token of the given scope."""
+    return cache.get_or_set(_version_key(scope, key), lambda: uuid.uuid4().hex, None)
+
+
+def bump_versions(scope, keys):
+    """Invalidates every result cached for the given keys of a scope."""
+    keys = set(keys) - {None}
+    if keys:
+        cache.set_many({_version_key(scope, key): uuid.uuid4().hex for key in keys}, None)
+
+
+def cached(scope, key, name, compute, timeout=DEFAULT_TIMEOUT):
+    """
+    Returns the result of compute() cached under the current version of the given scope.
+    name identifies the result within the scope and may contain any parameter the result depends on.
+    """
+    digest = hashlib.md5(name.encode()).hexdigest()
+    cache_key = f"matches:{scope}:{key}:{digest}:{get_version(scope, key)}"
+    result = cache.get(cache_key)
+    if result is None:
+        result = compute()
+        cache.set(cache_key, result, timeout)
+    return result
+
+
+def cached_many(scope, keys, name, compute_many, timeout=DEFAULT_TIMEOUT):
+    """
+    Bulk version of cached() for the same result over several keys of a scope.
+    compute_many(missing_keys) must return a dict with the result of each missing key.
+    """
+    keys = list(keys)
+    digest = hashlib.md5(name.encode()).hexdigest()
+    version_keys = {key: _version_key(scope, key) for key in keys}
+    versions = cache.get_many(version_keys.values())
+    new_versions = {version_key: uuid.uuid4().hex for version_key in version_keys.values() if version_key not in versions}
+    if new_versions:
+        cache.set_many(new_versions, None)
+        versions.update(new_versions)
+    cache_keys = {key: f"matches:{scope}:{key}:{digest}:{versions[version_keys[key]]}" for key in keys}
+    found = cache.get_many(cache_keys.values())
+    results = {key: found[cache_key] for key, cache_key in cache_keys.items() if cache_key in found}
+    missing = [key for key in keys if key not in results]
+    if missing:
+        computed = compute_many(missing)
+        cache.set_many({cache_keys[key]: computed[key] for key in missing}, timeout)
+        results.update(computed)
+    return results
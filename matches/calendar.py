@@ -0,0 +1,92 @@
+from datetime import timezone as dt_timezone
+
+from django.utils import timezone
+
+from .cache import cached, get_version
+from .models import Match
+
+PRODID = "-//MoleCup//Fixtures//IT"
+
+
+def escape(text):
+    """Escapes a TEXT value (RFC 5545, 3.3.11)."""
+    return str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def fold(line):
+    """Folds a content line longer than 75 octets (RFC 5545, 3.1)."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    while encoded:
+        size = 75 if not parts else 74
+        # do not split a multi-byte character
+        while size < len(encoded) and (encoded[size] & 0xC0) == 0x80:
+            size -= 1
+        parts.append(encoded[:size].decode())
+        encoded = encoded[size:]
+    return '\r\n '.join(parts)
+
+
+def ical_datetime(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def match_event(match, stamp):
+    summary = match.name
+    if match.finished:
+        summary = f"{summary} ({match.score_text})"
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:match-{match.id}@molecup",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART:{ical_datetime(match.datetime)}",
+        f"DTEND:{ical_datetime(match.ends_at)}",
+        f"SUMMARY:{escape(summary)}",
+        f"DESCRIPTION:{escape(match.get_stage_display())}",
+        f"CATEGORIES:{escape(match.stage)}",
+    ]
+    if match.stadium:
+        lines.append(f"LOCATION:{escape(f'{match.stadium.name}, {match.stadium.address}')}")
+        if match.stadium.latitude is not None and match.stadium.longitude is not None:
+            lines.append(f"GEO:{match.stadium.latitude};{match.stadium.longitude}")
+    lines.append('END:VEVENT')
+    return lines
+
+
+def render_calendar(name, matches):
+    """Renders the given matches as an iCalendar document."""
+    stamp = ical_datetime(timezone.now())
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f"PRODID:{PRODID}",
+        'CALSCALE:GREGORIAN',
+        f"X-WR-CALNAME:{escape(name)}",
+    ]
+    for match in matches:
+        lines += match_event(match, stamp)
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(fold(line) for line in lines) + '\r\n'
+
+
+# Each feed is keyed by the cache scope whose version changes with its matches.
+FEEDS = {
+    'league': lambda key: Match.objects.filter(participations__team__local_league_id=key).distinct(),
+    'team': lambda key: Match.objects.filter(participations__team_id=key),
+    'stadium': lambda key: Match.objects.filter(stadium_id=key),
+}
+
+
+def feed_etag(scope, key):
+    """Strong ETag of a feed: the current version of its cache scope."""
+    return f'"{scope}-{key}-{get_version(scope, key)}"'
+
+
+def feed_body(scope, key, name):
+    """Cached iCalendar document of a feed, rebuilt only when the version of its scope changes."""
+    def compute():
+        matches = FEEDS[scope](key).select_related('stadium').prefetch_related('participations__team').order_by('datetime')
+        return render_calendar(name, matches)
+    return cached(scope, key, f"calendar:{name}", compute)
@@ -0,0 +1,36 @@
+import heapq
+from datetime import timedelta
+from itertools import groupby
+
+from .models import MAX_MATCH_DURATION, Match
+
+
+def overlapping_matches(stadium_id, start, end, exclude_pk=None):
+    """
+    Matches booking the given stadium between start and end.
+    Since no slot is longer than MAX_MATCH_DURATION, the candidates are found with a range query
+    on the (stadium, datetime) index and only they are checked for an actual overlap.
+    """
+    candidates = Match.objects.filter(
+        stadium_id=stadium_id,
+        datetime__lt=end,
+        datetime__gt=start - timedelta(minutes=MAX_MATCH_DURATION),
+    ).exclude(pk=exclude_pk).order_by('datetime')
+    return [match for match in candidates if match.ends_at > start]
+
+
+def find_conflicts(matches):
+    """
+    Pairs of overlapping matches in the same stadium, found with a sweep over the matches sorted by stadium
+    and start, keeping a heap of the slots still running. Takes the matches queryset to audit.
+    """
+    matches = matches.filter(stadium__isnull=False).select_related('stadium').order_by('stadium_id', 'datetime', 'id')
+    conflicts = []
+    for _, stadium_matches in groupby(matches, key=lambda match: match.stadium_id):
+        running = []
+        for match in stadium_matches:
+            while running and running[0][0] <= match.datetime:
+                heapq.heappop(running)
+            conflicts += [(other, match) for _, _, other in running]
+            heapq.heappush(running, (match.ends_at, match.id, match))
+    return conflicts
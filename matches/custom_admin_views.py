@@ -1,18 +1,11 @@
 from datetime import date, datetime
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.admin.views.decorators import staff_member_required
-from django.contrib.auth.decorators import permission_required
 from django.utils import timezone
-from django.db.models import Q
-from .models import Match, MatchEvent, TeamParticipationMatch, Player, LocalLeague, Team
+from .models import Match, MatchEvent, TeamParticipationMatch, Player
+from .filters import MatchFilterForm
 from django import forms
 
-# Filter Form for the list page
-class MatchFilterForm(forms.Form):
-    local_league = forms.ModelChoiceField(queryset=LocalLeague.objects.all(), required=False, label="Local League", empty_label="All Leagues")
-    team = forms.ModelChoiceField(queryset=Team.objects.all(), required=False, label="Team", empty_label="All Teams")
-    date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}), label="Date")
-
 # Form for adding/editing events
 class MatchEventForm(forms.ModelForm):
     class Meta:
@@ -41,12 +34,7 @@ def match_list_view(request):
     
     form = MatchFilterForm(request.GET)
     if form.is_valid():
-        if form.cleaned_data['local_league']:
-            matches = matches.filter(participations__team__local_league=form.cleaned_data['local_league']).distinct()
-        if form.cleaned_data['team']:
-            matches = matches.filter(participations__team=form.cleaned_data['team']).distinct()
-        if form.cleaned_data['date']:
-            matches = matches.filter(datetime__date=form.cleaned_data['date'])
+        matches = form.filter(matches)
 
     today = timezone.localtime(timezone.now()).date()
 
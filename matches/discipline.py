@@ -0,0 +1,108 @@
+from bisect import bisect_right
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import DisciplinaryRecord, Match, MatchEvent, Suspension
+
+# Cards collected and matches played in friendlies do not count towards suspensions.
+EXCLUDED_STAGES = ['Ammichevole']
+
+
+def team_match_datetimes(team_ids):
+    """Returns the sorted datetimes of the (non friendly) matches of each given team."""
+    datetimes = defaultdict(list)
+    matches = Match.objects.filter(
+        participations__team_id__in=team_ids,
+    ).exclude(stage__in=EXCLUDED_STAGES).values_list('participations__team_id', 'datetime').order_by('datetime')
+    for team_id, datetime in matches:
+        datetimes[team_id].append(datetime)
+    return datetimes
+
+
+def compute_windows(suspensions):
+    """Sets ends_at on the given suspensions to the datetime of the last team match to be served."""
+    datetimes = team_match_datetimes({s.team_id for s in suspensions})
+    for suspension in suspensions:
+        team_datetimes = datetimes[suspension.team_id]
+        last = bisect_right(team_datetimes, suspension.starts_after) + suspension.matches - 1
+        suspension.ends_at = team_datetimes[last] if last < len(team_datetimes) else None
+
+
+def refresh_discipline(player_ids):
+    """Recomputes the disciplinary records and the suspensions of the given players from their card events."""
+    player_ids = set(player_ids) - {None}
+    if not player_ids:
+        return
+    events = MatchEvent.objects.filter(
+        player_id__in=player_ids,
+        event_type__in=['YELLOW_CARD', 'RED_CARD'],
+    ).exclude(
+        team_match__match__stage__in=EXCLUDED_STAGES,
+    ).select_related(
+        'team_match__match',
+        'team_match__team__local_league',
+    ).order_by('team_match__match__datetime', 'minute', 'id')
+
+    records = {}
+    suspensions = []
+    for event in events:
+        match = event.team_match.match
+        team = event.team_match.team
+        league = team.local_league
+        record = records.get((event.player_id, league.id))
+        if record is None:
+            record = records[(event.player_id, league.id)] = DisciplinaryRecord(player_id=event.player_id, local_league=league)
+        if event.event_type == 'YELLOW_CARD':
+            record.yellow_cards += 1
+            reason, matches = 'YELLOW_CARDS', league.yellow_cards_suspension
+            if record.yellow_cards % league.yellow_cards_threshold != 0:
+                continue
+        else:
+            record.red_cards += 1
+            reason, matches = 'RED_CARD', league.red_card_suspension
+        if matches:
+            suspensions.append(Suspension(
+                player_id=event.player_id,
+                local_league=league,
+                team=team,
+                match=match,
+                reason=reason,
+                matches=matches,
+                starts_after=match.datetime,
+            ))
+    compute_windows(suspensions)
+
+    with transaction.atomic():
+        DisciplinaryRecord.objects.filter(player_id__in=player_ids).delete()
+        Suspension.objects.filter(player_id__in=player_ids).delete()
+        DisciplinaryRecord.objects.bulk_create(records.values())
+        Suspension.objects.bulk_create(suspensions)
+
+
+def refresh_suspension_windows(team_ids):
+    """Recomputes the end of the suspension windows of the given teams after their schedule changed."""
+    suspensions = list(Suspension.objects.filter(team_id__in=set(team_ids) - {None}))
+    compute_windows(suspensions)
+    Suspension.objects.bulk_update(suspensions, ['ends_at'])
+
+
+def refresh_match_discipline(match_id):
+    """Recomputes the discipline of the players carded in the given match, e.g. after it was moved."""
+    player_ids = MatchEvent.objects.filter(
+        team_match__match_id=match_id,
+        event_type__in=['YELLOW_CARD', 'RED_CARD'],
+    ).values_list('player_id', flat=True)
+    refresh_discipline(player_ids)
+
+
+def rebuild_all_discipline():
+    """Recomputes the disciplinary records and suspensions of every carded player."""
+    player_ids = MatchEvent.objects.filter(
+        event_type__in=['YELLOW_CARD', 'RED_CARD'],
+        player__isnull=False,
+    ).values_list('player_id', flat=True).distinct()
+    with transaction.atomic():
+        DisciplinaryRecord.objects.all().delete()
+        Suspension.objects.all().delete()
+        refresh_discipline(player_ids)
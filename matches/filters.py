@@ -0,0 +1,110 @@
+from datetime import datetime, time, timedelta
+
+from django import forms
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LocalLeague, Match, Stadium, Team, TeamParticipationMatch
+
+# Filters on the teams of a match are semi-joins on the participations instead of
+# a join followed by DISTINCT, which de-duplicates (sorts) the whole result rows.
+# They are written as pk IN (subquery) rather than as a correlated EXISTS: PostgreSQL
+# plans both as the same semi-join, but SQLite runs a correlated EXISTS once per match
+# while it drives the IN form from the (team, match) index of the participations.
+# See the benchmark_match_filters command.
+
+
+def participates(**lookups):
+    """Condition true for the matches with a participation matching the given lookups."""
+    return Q(pk__in=TeamParticipationMatch.objects.filter(**lookups).values('match_id'))
+
+
+def day_start(day):
+    """Aware datetime of the start of a day in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def filter_matches(matches, local_league=None, team=None, stage=None, status=None, date=None, date_from=None, date_to=None, stadium=None):
+    """
+    Filters a Match queryset, ignoring the empty criteria.
+    local_league and team accept instances or slugs, stadium an instance or an id.
+    date_from and date_to are inclusive dates.
+    """
+    if local_league:
+        if isinstance(local_league, str):
+            matches = matches.filter(participates(team__local_league__slug=local_league))
+        else:
+            matches = matches.filter(participates(team__local_league=local_league))
+    if team:
+        if isinstance(team, str):
+            matches = matches.filter(participates(team__slug=team))
+        else:
+            matches = matches.filter(participates(team=team))
+    if stage:
+        matches = matches.filter(stage=stage)
+    if status:
+        matches = matches.filter(status=status)
+    # dates are turned into datetime bounds: a cast of the column to a date could not use its indexes
+    if date:
+        matches = matches.filter(datetime__gte=day_start(date), datetime__lt=day_start(date + timedelta(days=1)))
+    if date_from:
+        matches = matches.filter(datetime__gte=day_start(date_from))
+    if date_to:
+        matches = matches.filter(datetime__lt=day_start(date_to + timedelta(days=1)))
+    if stadium:
+        matches = matches.filter(stadium=stadium)
+    return matches
+
+
+class BaseMatchFilterForm(forms.Form):
+    stage = forms.ChoiceField(choices=[('', 'All stages')] + Match.STAGES_CHOICES, required=False, label="Stage")
+    status = forms.ChoiceField(choices=[('', 'All statuses')] + Match.STATUS_CHOICES, required=False, label="Status")
+    date = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}), label="Date")
+    date_from = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}), label="From")
+    date_to = forms.DateField(required=False, widget=forms.DateInput(attrs={'type': 'date'}), label="To")
+
+    def clean(self):
+        cleaned_data = super().clean()
+        date_from, date_to = cleaned_data.get('date_from'), cleaned_data.get('date_to')
+        if date_from and date_to and date_from > date_to:
+            raise forms.ValidationError("The start of the date range must not be after its end.")
+        return cleaned_data
+
+    def filter(self, matches):
+        """Applies the cleaned filters to a Match queryset (the form must be valid)."""
+        return filter_matches(matches, **self.cleaned_data)
+
+
+class MatchFilterForm(BaseMatchFilterForm):
+    """Filters of the admin match list, selecting the league, team and stadium among the existing ones."""
+    local_league = forms.ModelChoiceField(queryset=LocalLeague.objects.all(), required=False, label="Local League", empty_label="All Leagues")
+    team = forms.ModelChoiceField(queryset=Team.objects.select_related('local_league'), required=False, label="Team", empty_label="All Teams")
+    stadium = forms.ModelChoiceField(queryset=Stadium.objects.all(), required=False, label="Stadium", empty_label="All Stadiums")
+
+    field_order = ['local_league', 'team', 'stage', 'status', 'date', 'date_from', 'date_to', 'stadium']
+
+
+class MatchQueryForm(BaseMatchFilterForm):
+    """
+    Filters of the matches API, given as query parameters (see QUERY_PARAMS).
+    Leagues and teams are given by slug and are not looked up: unknown slugs simply match nothing.
+    """
+    local_league = forms.SlugField(required=False)
+    team = forms.SlugField(required=False)
+    stadium = forms.IntegerField(required=False, min_value=1)
+
+    # query parameter of each field
+    QUERY_PARAMS = {
+        'local_league': 'local-league',
+        'team': 'team',
+        'stage': 'stage',
+        'status': 'status',
+        'date': 'date',
+        'date_from': 'date-from',
+        'date_to': 'date-to',
+        'stadium': 'stadium',
+    }
+
+    @classmethod
+    def from_query_params(cls, query_params):
+        return cls({field: query_params.get(param) for field, param in cls.QUERY_PARAMS.items() if param in query_params})
@@ -0,0 +1,220 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .cache import bump_versions
+from .discipline import refresh_discipline, refresh_suspension_windows
+from .filters import filter_matches
+from .models import MAX_MATCH_DURATION, BlackoutDate, LocalLeague, Match, MatchEvent, Stadium, TeamParticipationMatch
+from .signals import muted_signals
+from .standings import refresh_standings
+
+
+class FixtureError(ValueError):
+    pass
+
+
+def round_robin_rounds(team_ids, double=False):
+    """
+    Rounds of a round-robin between the given teams as lists of (home, away) pairs, built with the circle method.
+    Home and away alternate for every team, with at most one break (two home or two away matches in a row) each.
+    With an odd number of teams one team rests in each round. A double round-robin repeats the rounds
+    with home and away swapped.
+    """
+    teams = list(team_ids)
+    if len(teams) % 2:
+        teams.append(None)
+    n = len(teams)
+    fixed, rotating = teams[0], teams[1:]
+    rounds = []
+    for r in range(n - 1):
+        current = [fixed] + rotating
+        pairs = []
+        for i in range(n // 2):
+            home, away = current[i], current[n - 1 - i]
+            # the fixed team alternates every round, the other pairs by their position in the circle
+            if (r % 2 == 1) if i == 0 else (i % 2 == 1):
+                home, away = away, home
+            if home is not None and away is not None:
+                pairs.append((home, away))
+        rounds.append(pairs)
+        rotating = rotating[-1:] + rotating[:-1]
+    if double:
+        rounds += [[(away, home) for home, away in pairs] for pairs in rounds]
+    return rounds
+
+
+def load_blackouts(team_ids, stadium_ids, first_day, last_day):
+    """Sets of the unavailable days of each team and stadium between the given days, from a single query."""
+    blackouts = BlackoutDate.objects.filter(
+        Q(team_id__in=team_ids) | Q(stadium_id__in=stadium_ids),
+        start_date__lte=last_day,
+        end_date__gte=first_day,
+    ).values_list('team_id', 'stadium_id', 'start_date', 'end_date')
+    teams, stadiums = defaultdict(set), defaultdict(set)
+    for team_id, stadium_id, start, end in blackouts:
+        days = {max(start, first_day) + timedelta(days=d) for d in range((min(end, last_day) - max(start, first_day)).days + 1)}
+        if team_id is not None:
+            teams[team_id] |= days
+        else:
+            stadiums[stadium_id] |= days
+    return teams, stadiums
+
+
+def load_bookings(stadium_ids, first_day, last_day, exclude=()):
+    """
+    Booked intervals of the given stadiums between the given days (other leagues and stages included),
+    as naive local (start, end) datetimes keyed by (stadium_id, day), from a single query.
+    """
+    first = timezone.make_aware(datetime.combine(first_day, time.min)) - timedelta(minutes=MAX_MATCH_DURATION)
+    last = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    matches = Match.objects.filter(
+        stadium_id__in=[s for s in stadium_ids if s is not None],
+        datetime__gte=first,
+        datetime__lt=last,
+    ).exclude(pk__in=list(exclude)).values_list('stadium_id', 'datetime', 'duration')
+    bookings = defaultdict(list)
+    for stadium_id, start, duration in matches:
+        start = timezone.make_naive(start)
+        end = start + timedelta(minutes=duration)
+        # a booking running past midnight also occupies the next day
+        for day in {start.date(), end.date()}:
+            bookings[(stadium_id, day)].append((start, end))
+    return bookings
+
+
+def free_slot(bookings, day, kickoff, slot):
+    """First kick-off from the given time, every slot minutes, whose slot ends by midnight and overlaps no booking."""
+    start = datetime.combine(day, kickoff)
+    midnight = datetime.combine(day + timedelta(days=1), time.min)
+    while start + timedelta(minutes=slot) <= midnight:
+        end = start + timedelta(minutes=slot)
+        if not any(booked_start < end and start < booked_end for booked_start, booked_end in bookings):
+            return start
+        start = end
+    return None
+
+
+def schedule_fixtures(local_league, start, kickoff=time(20, 0), interval=7, slot=None, double=False, exclude=()):
+    """
+    Plans the round-robin of a local league: returns (datetime, stadium_id, home_id, away_id) tuples.
+    The matches of round n are spread across the days of its window, from start + n * interval days, avoiding the
+    blackout days of their teams and stadiums. Matches of the same stadium and day are slot minutes apart (default:
+    the match slot duration) from the kick-off time, end by midnight, and do not overlap the matches already booked
+    in the stadium (those of other leagues included, but not the excluded ones that are about to be replaced).
+    Without stadiums the matches of a day all kick off at the same time.
+    """
+    if slot is None:
+        slot = settings.MATCH_SLOT_MINUTES
+    if not 1 <= slot <= MAX_MATCH_DURATION:
+        raise FixtureError(f"The slot must be between 1 and {MAX_MATCH_DURATION} minutes")
+    if interval < 1:
+        raise FixtureError("The interval between rounds must be at least one day")
+    team_ids = list(local_league.teams.order_by('name').values_list('id', flat=True))
+    stadium_ids = list(local_league.stadiums.order_by('id').values_list('id', flat=True)) or [None]
+    if len(team_ids) < 2:
+        raise FixtureError(f"{local_league} needs at least two teams")
+    rounds = round_robin_rounds(team_ids, double=double)
+    last_day = start + timedelta(days=len(rounds) * interval)
+    team_blackouts, stadium_blackouts = load_blackouts(team_ids, stadium_ids, start, last_day)
+    bookings = load_bookings(stadium_ids, start, last_day, exclude)
+
+    fixtures = []
+    for number, pairs in enumerate(rounds):
+        days = [start + timedelta(days=number * interval + shift) for shift in range(interval)]
+        day_load = defaultdict(int)
+        for index, (home, away) in enumerate(pairs):
+            placed = None
+            # the least loaded days of the window first, so that the round is spread across them
+            for day in sorted(days, key=lambda d: day_load[d]):
+                if day in team_blackouts[home] or day in team_blackouts[away]:
+                    continue
+                # rotate the stadiums between rounds, then take the earliest free slot of the day
+                candidates = [stadium_ids[(number + index + k) % len(stadium_ids)] for k in range(len(stadium_ids))]
+                options = []
+                for stadium in candidates:
+                    if stadium is None:
+                        options.append((datetime.combine(day, kickoff), len(options), stadium))
+                    elif day not in stadium_blackouts[stadium]:
+                        kickoff_at = free_slot(bookings[(stadium, day)], day, kickoff, slot)
+                        if kickoff_at is not None:
+                            options.append((kickoff_at, len(options), stadium))
+                if options:
+                    kickoff_at, _, stadium = min(options)
+                    placed = (day, kickoff_at, stadium)
+                    break
+            if placed is None:
+                raise FixtureError(f"No available day, stadium and slot in round {number + 1} for teams {home} and {away}")
+            day, kickoff_at, stadium = placed
+            day_load[day] += 1
+            if stadium is not None:
+                bookings[(stadium, day)].append((kickoff_at, kickoff_at + timedelta(minutes=slot)))
+            fixtures.append((timezone.make_aware(kickoff_at), stadium, home, away))
+    return fixtures
+
+
+def generate_fixtures(local_league, start, stage='Gironi', replace=False, **options):
+    """
+    Creates the round-robin matches of a local league with bulk inserts in a single transaction.
+    Existing scheduled matches of the stage are deleted first with replace, otherwise their presence is an error.
+    The league and its stadiums are locked while the existing matches are read, the schedule is planned and
+    the matches are inserted, so concurrent generations for the league or for leagues sharing its stadiums
+    wait for this one instead of booking the same slots.
+    The signal handlers are muted meanwhile: standings, discipline, suspension windows and cached results
+    of the teams are refreshed once at the end. Returns the number of matches created.
+    """
+    if options.get('slot') is None:
+        options['slot'] = settings.MATCH_SLOT_MINUTES
+    slot = options['slot']
+    with transaction.atomic():
+        # held until the matches are inserted
+        LocalLeague.objects.select_for_update().get(pk=local_league.pk)
+        list(Stadium.objects.select_for_update().filter(pk__in=local_league.stadiums.values('pk')).order_by('pk').values_list('pk', flat=True))
+        existing = filter_matches(Match.objects.filter(stage=stage), local_league=local_league)
+        existing_ids = list(existing.values_list('pk', flat=True))
+        if existing_ids:
+            if not replace:
+                raise FixtureError(f"{local_league} already has {stage} matches")
+            if existing.exclude(status='SCHEDULED').exists():
+                raise FixtureError(f"{local_league} has {stage} matches already played")
+        fixtures = schedule_fixtures(local_league, start, exclude=existing_ids, **options)
+        team_ids = {team_id for _, _, home, away in fixtures for team_id in (home, away)}
+        stadium_ids = {stadium for _, stadium, _, _ in fixtures}
+        with muted_signals():
+            if existing_ids:
+                replaced = TeamParticipationMatch.objects.filter(match_id__in=existing_ids)
+                team_ids |= set(replaced.values_list('team_id', flat=True))
+                stadium_ids |= set(Match.objects.filter(pk__in=existing_ids).values_list('stadium_id', flat=True))
+                carded_player_ids = list(MatchEvent.objects.filter(
+                    team_match__match_id__in=existing_ids,
+                    event_type__in=['YELLOW_CARD', 'RED_CARD'],
+                ).values_list('player_id', flat=True))
+                # participations, events and suspensions cascade
+                Match.objects.filter(pk__in=existing_ids).delete()
+            matches = Match.objects.bulk_create([
+                Match(datetime=kickoff_at, duration=slot, stadium_id=stadium, stage=stage, pair_key=Match.pair_key_for([home, away]))
+                for kickoff_at, stadium, home, away in fixtures
+            ])
+            TeamParticipationMatch.objects.bulk_create([
+                participation
+                for match, (_, _, home, away) in zip(matches, fixtures)
+                for participation in (
+                    TeamParticipationMatch(match=match, team_id=home, is_home=True),
+                    TeamParticipationMatch(match=match, team_id=away, is_home=False),
+                )
+            ])
+            refresh_standings(team_ids)
+            if existing_ids:
+                refresh_discipline(carded_player_ids)
+            refresh_suspension_windows(team_ids)
+    bump_versions('match', existing_ids)
+    bump_versions('team', team_ids)
+    bump_versions('league', [local_league.id])
+    bump_versions('stadium', stadium_ids)
+    if stage in Match.KNOCKOUT_STAGES:
+        bump_versions('knockout', [local_league.id])
+    return len(matches)
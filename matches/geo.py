@@ -0,0 +1,47 @@
+from math import asin, cos, degrees, radians, sin, sqrt
+
+from .models import Stadium
+
+EARTH_RADIUS_KM = 6371.0088
+DEFAULT_RADIUS_KM = 10
+MAX_RADIUS_KM = 200
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres between two points given in degrees."""
+    lat1, lon1, lat2, lon2 = map(radians, (lat1, lon1, lat2, lon2))
+    a = sin((lat2 - lat1) / 2) ** 2 + cos(lat1) * cos(lat2) * sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * asin(min(1, sqrt(a)))
+
+
+def bounding_box(lat, lon, radius_km):
+    """
+    Latitude and longitude ranges containing every point within radius_km of the given point.
+    The longitude range is None when the box reaches a pole or crosses the antimeridian.
+    """
+    delta_lat = degrees(radius_km / EARTH_RADIUS_KM)
+    lat_range = (max(lat - delta_lat, -90), min(lat + delta_lat, 90))
+    if lat_range[0] <= -90 or lat_range[1] >= 90:
+        return lat_range, None
+    delta_lon = degrees(radius_km / (EARTH_RADIUS_KM * cos(radians(lat))))
+    if lon - delta_lon < -180 or lon + delta_lon > 180:
+        return lat_range, None
+    return lat_range, (lon - delta_lon, lon + delta_lon)
+
+
+def stadiums_nearby(lat, lon, radius_km=DEFAULT_RADIUS_KM, queryset=None):
+    """
+    Stadiums within radius_km of the given point, nearest first, each with a distance_km attribute.
+    A bounding box prefilter uses the (latitude, longitude) index, so the exact haversine distance
+    is only computed for the stadiums in the box.
+    """
+    lat_range, lon_range = bounding_box(lat, lon, radius_km)
+    stadiums = (queryset if queryset is not None else Stadium.objects.all()).filter(latitude__range=lat_range)
+    if lon_range is not None:
+        stadiums = stadiums.filter(longitude__range=lon_range)
+    nearby = []
+    for stadium in stadiums:
+        stadium.distance_km = haversine_km(lat, lon, float(stadium.latitude), float(stadium.longitude))
+        if stadium.distance_km <= radius_km:
+            nearby.append(stadium)
+    return sorted(nearby, key=lambda stadium: stadium.distance_km)
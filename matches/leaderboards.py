@@ -0,0 +1,110 @@
+from django.db.models import Count, F, FloatField, Sum
+from django.db.models.functions import Cast
+
+from .cache import cached
+from .models import MatchEvent, Standing
+
+# Results across every local league are not invalidated by each change of every league,
+# which would make them recomputed after almost every event on match days:
+# they are cached for a short time instead and may be that much out of date.
+NATIONAL_TIMEOUT = 60
+
+
+def rank_rows(rows, key):
+    """Adds a competition rank (1, 2, 2, 4...) to rows already sorted by descending key."""
+    previous = None
+    for position, row in enumerate(rows, start=1):
+        if row[key] != previous:
+            rank = position
+            previous = row[key]
+        row['rank'] = rank
+    return rows
+
+
+def compute_scorers(local_league_id=None, stage=None):
+    """Goal leaders computed with a single grouped query over the GOAL events."""
+    events = MatchEvent.objects.filter(event_type='GOAL', player__isnull=False)
+    if local_league_id is not None:
+        events = events.filter(team_match__team__local_league_id=local_league_id)
+    if stage:
+        events = events.filter(team_match__match__stage=stage)
+    rows = events.values(
+        'player_id',
+        'player__first_name',
+        'player__last_name',
+        'player__shirt_number',
+        'player__team__slug',
+        'player__team__name',
+    ).annotate(goals=Count('id')).order_by('-goals', 'player__last_name', 'player__first_name', 'player_id')
+    scorers = [{
+        'player': {
+            'id': row['player_id'],
+            'first_name': row['player__first_name'],
+            'last_name': row['player__last_name'],
+            'shirt_number': row['player__shirt_number'],
+        },
+        'team': {
+            'slug': row['player__team__slug'],
+            'name': row['player__team__name'],
+        },
+        'goals': row['goals'],
+    } for row in rows]
+    return rank_rows(scorers, 'goals')
+
+
+def top_scorers(local_league_id=None, stage=None, top=None):
+    """
+    Cached goal leaders of a local league (or of every league, see NATIONAL_TIMEOUT), optionally restricted to a stage.
+    With top=N only the players ranked N or better are returned, so ties on the last place are kept.
+    """
+    def compute():
+        return compute_scorers(local_league_id, stage)
+
+    if local_league_id is None:
+        scorers = cached('national', 'all', f"scorers:{stage}", compute, timeout=NATIONAL_TIMEOUT)
+    else:
+        scorers = cached('league', local_league_id, f"scorers:{stage}", compute)
+    if top is not None:
+        scorers = [row for row in scorers if row['rank'] <= top]
+    return scorers
+
+
+def compute_team_leaderboard(stage=None, min_played=1):
+    """
+    Teams of every local league by points per game, from one grouped query over the persisted standings rows.
+    Without a stage the rows of every stage but friendlies are summed.
+    """
+    rows = Standing.objects.exclude(stage='Ammichevole')
+    if stage:
+        rows = rows.filter(stage=stage)
+    rows = rows.values(
+        'team_id', 'team__slug', 'team__name', 'team__local_league__slug', 'team__local_league__name',
+    ).annotate(
+        played_total=Sum('played'),
+        points_total=Sum('points'),
+        goal_difference_total=Sum('goal_difference'),
+        goals_for_total=Sum('goals_for'),
+    ).filter(played_total__gte=min_played).annotate(
+        points_per_game=Cast('points_total', FloatField()) / F('played_total'),
+    ).order_by('-points_per_game', '-goal_difference_total', '-goals_for_total', 'team__name')
+    teams = [{
+        'team': {'slug': row['team__slug'], 'name': row['team__name']},
+        'local_league': {'slug': row['team__local_league__slug'], 'name': row['team__local_league__name']},
+        'played': row['played_total'],
+        'points': row['points_total'],
+        'points_per_game': round(row['points_per_game'], 3),
+        'goal_difference': row['goal_difference_total'],
+        'goals_for': row['goals_for_total'],
+    } for row in rows]
+    return rank_rows(teams, 'points_per_game')
+
+
+def team_leaderboard(stage=None, min_played=1, top=None):
+    """National teams leaderboard, cached for NATIONAL_TIMEOUT seconds. With top=N ties on the last place are kept."""
+    teams = cached(
+        'national', 'all', f"teams:{stage}:{min_played}",
+        lambda: compute_team_leaderboard(stage, min_played), timeout=NATIONAL_TIMEOUT,
+    )
+    if top is not None:
+        teams = [row for row in teams if row['rank'] <= top]
+    return teams
@@ -0,0 +1,64 @@
+from django.utils import timezone
+
+from .cache import cached
+from .filters import filter_matches
+from .models import Match, TeamParticipationMatch
+
+# The homepage polls these lists: they are cached for a few seconds instead of being
+# invalidated, so that live score changes do not recompute them on every poll.
+LIVE_TIMEOUT = 5
+
+DEFAULT_UPCOMING = 10
+MAX_UPCOMING = 50
+
+
+def scoreboard(matches):
+    """
+    Minimal projection of the given matches (a sliced or ordered queryset), from two queries:
+    id, datetime, stage, status, stadium name and the home and away teams with their score.
+    """
+    rows = list(matches.values('id', 'datetime', 'stage', 'status', 'stadium__name'))
+    sides = {}
+    participations = TeamParticipationMatch.objects.filter(match_id__in=[row['id'] for row in rows]).values(
+        'match_id', 'is_home', 'team__slug', 'team__name', 'team__short_name', 'team__local_league__slug', 'score', 'penalties',
+    )
+    for p in participations:
+        sides[(p['match_id'], p['is_home'])] = {
+            'slug': p['team__slug'],
+            'name': p['team__name'],
+            'short_name': p['team__short_name'],
+            'local_league': p['team__local_league__slug'],
+            'score': p['score'],
+            'penalties': p['penalties'],
+        }
+    return [{
+        'id': row['id'],
+        'datetime': row['datetime'],
+        'stage': row['stage'],
+        'status': row['status'],
+        'stadium': row['stadium__name'],
+        'home': sides.get((row['id'], True)),
+        'away': sides.get((row['id'], False)),
+    } for row in rows]
+
+
+def live_matches(local_league=None):
+    """Matches being played (of a local league, by slug), by kick-off. Served from the match_live_idx partial index."""
+    return cached(
+        'national', 'all', f"live:{local_league}",
+        lambda: scoreboard(filter_matches(Match.objects.filter(status='LIVE'), local_league=local_league).order_by('datetime')),
+        timeout=LIVE_TIMEOUT,
+    )
+
+
+def upcoming_matches(local_league=None, limit=DEFAULT_UPCOMING):
+    """
+    The next limit (at most MAX_UPCOMING) scheduled matches not started yet (of a local league, by slug),
+    by kick-off. Served from the match_scheduled_idx partial index.
+    """
+    def compute():
+        matches = Match.objects.filter(status='SCHEDULED', datetime__gte=timezone.now())
+        return scoreboard(filter_matches(matches, local_league=local_league).order_by('datetime')[:MAX_UPCOMING])
+
+    matches = cached('national', 'all', f"upcoming:{local_league}", compute, timeout=LIVE_TIMEOUT)
+    return matches[:min(limit, MAX_UPCOMING)]
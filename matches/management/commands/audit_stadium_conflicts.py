@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from matches.conflicts import find_conflicts
+from matches.filters import filter_matches
+from matches.models import Match
+
+
+class Command(BaseCommand):
+    help = "Lists the matches booking the same stadium at overlapping times."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--league', help="Slug of a local league to restrict the audit to")
+        parser.add_argument('--upcoming', action='store_true', help="Only audit the matches not played yet")
+
+    def handle(self, *args, **options):
+        matches = filter_matches(
+            Match.objects.all(),
+            local_league=options['league'],
+            status='SCHEDULED' if options['upcoming'] else None,
+        )
+        conflicts = find_conflicts(matches)
+        for first, second in conflicts:
+            self.stdout.write(
+                f"{first.stadium.name}: match {first.id} ({first.datetime:%Y-%m-%d %H:%M}-{first.ends_at:%H:%M}) "
+                f"overlaps match {second.id} ({second.datetime:%Y-%m-%d %H:%M}-{second.ends_at:%H:%M})"
+            )
+        style = self.style.WARNING if conflicts else self.style.SUCCESS
+        self.stdout.write(style(f"{len(conflicts)} stadium conflicts found."))
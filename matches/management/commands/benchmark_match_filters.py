@@ -0,0 +1,92 @@
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from matches.filters import filter_matches
+from matches.models import LocalLeague, Match, Team, TeamParticipationMatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Times the ?local-league= filter of the matches list written as a join with DISTINCT, as a correlated EXISTS "
+        "and as the semi-join of matches.filters, on synthetic matches created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--matches', type=int, default=10000, help="Synthetic matches to create (default: 10000)")
+        parser.add_argument('--leagues', type=int, default=10, help="Synthetic local leagues (default: 10)")
+        parser.add_argument('--teams', type=int, default=12, help="Teams per synthetic league (default: 12)")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs of each query (default: 5)")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0)")
+
+    def handle(self, *args, **options):
+        if options['matches'] < 1 or options['leagues'] < 1 or options['teams'] < 2 or options['repeat'] < 1:
+            raise CommandError("--matches, --leagues and --repeat must be at least 1 and --teams at least 2")
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            slug = self.create_matches(rng, options['matches'], options['leagues'], options['teams'])
+            base = Match.objects.select_related('stadium')
+            queries = {
+                'join + DISTINCT': base.filter(participations__team__local_league__slug=slug).distinct(),
+                'correlated EXISTS': base.filter(Exists(TeamParticipationMatch.objects.filter(
+                    match=OuterRef('pk'), team__local_league__slug=slug,
+                ))),
+                'semi-join (filters)': filter_matches(base, local_league=slug),
+            }
+            timings = {}
+            for name, queryset in queries.items():
+                # only the database work is timed, building the model instances costs the same for every query
+                sql, params = queryset.query.sql_with_params()
+                runs = []
+                with connection.cursor() as cursor:
+                    for _ in range(options['repeat']):
+                        start = time.perf_counter()
+                        cursor.execute(sql, params)
+                        found = len(cursor.fetchall())
+                        runs.append(time.perf_counter() - start)
+                timings[name] = statistics.median(runs)
+                self.stdout.write(f"{name}: {found} matches, median {timings[name] * 1000:.1f}ms")
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS(
+            f"The filter is {timings['join + DISTINCT'] / timings['semi-join (filters)']:.2f}x as fast as join + DISTINCT "
+            f"over {options['matches']} matches."
+        ))
+
+    def create_matches(self, rng, match_count, league_count, teams_per_league):
+        """Creates the synthetic leagues, teams and matches with bulk inserts (no signals). Returns a league slug."""
+        leagues = LocalLeague.objects.bulk_create([
+            LocalLeague(slug=f'benchmark-{i}', name=f'Benchmark {i}', title=f'Benchmark {i}') for i in range(league_count)
+        ])
+        teams = Team.objects.bulk_create([
+            Team(slug=f'{league.slug}-{i}', name=f'{league.name} {i}', short_name=f'B{i}', local_league=league)
+            for league in leagues for i in range(teams_per_league)
+        ])
+        if teams[0].pk is None:
+            raise CommandError("The database backend does not return the ids of bulk inserted rows")
+        teams_by_league = {}
+        for team in teams:
+            teams_by_league.setdefault(team.local_league_id, []).append(team)
+
+        now = timezone.now()
+        pairs = []
+        matches = []
+        for _ in range(match_count):
+            pairs.append(rng.sample(teams_by_league[rng.choice(leagues).id], 2))
+            matches.append(Match(
+                datetime=now - timedelta(minutes=rng.randrange(3 * 365 * 24 * 60)),
+                stage=rng.choice(Match.STAGES_CHOICES)[0],
+                status=rng.choice(Match.STATUS_CHOICES)[0],
+            ))
+        matches = Match.objects.bulk_create(matches, batch_size=1000)
+        TeamParticipationMatch.objects.bulk_create([
+            TeamParticipationMatch(match=match, team=team, is_home=is_home)
+            for match, (home, away) in zip(matches, pairs)
+            for team, is_home in ((home, True), (away, False))
+        ], batch_size=1000)
+        return leagues[0].slug
@@ -0,0 +1,41 @@
+from datetime import date, time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matches.fixtures import FixtureError, generate_fixtures
+from matches.models import LocalLeague
+
+
+class Command(BaseCommand):
+    help = "Creates the round-robin schedule of a local league."
+
+    def add_arguments(self, parser):
+        parser.add_argument('league', help="Slug of the local league")
+        parser.add_argument('--start', type=date.fromisoformat, required=True, help="First matchday (YYYY-MM-DD)")
+        parser.add_argument('--kickoff', type=time.fromisoformat, default=time(20, 0), help="Kick-off time of the first match of a day (default: 20:00)")
+        parser.add_argument('--interval', type=int, default=7, help="Days between rounds (default: 7)")
+        parser.add_argument('--slot', type=int, help="Minutes between matches in the same stadium and day (default: MATCH_SLOT_MINUTES)")
+        parser.add_argument('--stage', default='Gironi', help="Stage of the created matches (default: Gironi)")
+        parser.add_argument('--double', action='store_true', help="Double round-robin, home and away")
+        parser.add_argument('--replace', action='store_true', help="Delete the scheduled matches of the stage first")
+
+    def handle(self, *args, **options):
+        local_league = LocalLeague.objects.filter(slug=options['league']).first()
+        if local_league is None:
+            raise CommandError(f"Unknown local league {options['league']}")
+        if options['interval'] < 1:
+            raise CommandError("--interval must be at least 1")
+        try:
+            created = generate_fixtures(
+                local_league,
+                options['start'],
+                stage=options['stage'],
+                replace=options['replace'],
+                kickoff=options['kickoff'],
+                interval=options['interval'],
+                slot=options['slot'],
+                double=options['double'],
+            )
+        except FixtureError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Created {created} matches for {local_league.slug}."))
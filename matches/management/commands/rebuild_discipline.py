@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from matches.discipline import rebuild_all_discipline
+from matches.models import DisciplinaryRecord, Suspension
+
+
+class Command(BaseCommand):
+    help = "Recomputes the disciplinary records and suspension windows of every player from the card events."
+
+    def handle(self, *args, **options):
+        rebuild_all_discipline()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {DisciplinaryRecord.objects.count()} disciplinary records and {Suspension.objects.count()} suspensions."
+        ))
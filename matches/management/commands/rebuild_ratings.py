@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from matches.ratings import rebuild_all_ratings
+
+
+class Command(BaseCommand):
+    help = "Recomputes the power rating of every team by replaying the finished matches in order."
+
+    def handle(self, *args, **options):
+        matches = rebuild_all_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Replayed {matches} rated matches."))
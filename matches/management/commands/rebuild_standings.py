@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from matches.standings import rebuild_all_snapshots, rebuild_all_standings
+
+
+class Command(BaseCommand):
+    help = "Recomputes the persisted standings table of every team and the matchday snapshots from the finished matches."
+
+    def handle(self, *args, **options):
+        rows = rebuild_all_standings()
+        snapshots = rebuild_all_snapshots()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} standings rows and {snapshots} snapshots."))
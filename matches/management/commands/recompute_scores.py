@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from matches.cache import bump_versions
+from matches.models import Match, Team, TeamParticipationMatch
+from matches.ratings import rebuild_all_ratings
+from matches.standings import rebuild_all_snapshots, rebuild_all_standings
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the stored goals and score of every match participation, then rebuilds the standings, "
+        "their snapshots and the ratings, and invalidates the cached results of the matches whose score changed."
+    )
+
+    def handle(self, *args, **options):
+        before = dict(TeamParticipationMatch.objects.values_list('pk', 'score'))
+        with transaction.atomic():
+            TeamParticipationMatch.objects.all().refresh_scores()
+        changed = [pk for pk, score in TeamParticipationMatch.objects.values_list('pk', 'score') if before.get(pk) != score]
+        self.stdout.write(self.style.SUCCESS(f"Recomputed scores of {len(before)} participations, {len(changed)} changed."))
+        rows = rebuild_all_standings()
+        snapshots = rebuild_all_snapshots()
+        rated = rebuild_all_ratings()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} standings rows and {snapshots} snapshots, replayed {rated} rated matches."))
+        self.invalidate(changed)
+
+    def invalidate(self, participation_ids):
+        """Bumps the cache versions of the matches of the given participations, their teams, leagues and stadiums."""
+        match_ids = set(TeamParticipationMatch.objects.filter(pk__in=participation_ids).values_list('match_id', flat=True))
+        matches = Match.objects.filter(pk__in=match_ids)
+        teams = Team.objects.filter(match_participations__match_id__in=match_ids).values_list('id', 'local_league_id').distinct()
+        knockout_league_ids = Team.objects.filter(
+            match_participations__match_id__in=match_ids, match_participations__match__stage__in=Match.KNOCKOUT_STAGES,
+        ).values_list('local_league_id', flat=True).distinct()
+        bump_versions('match', match_ids)
+        bump_versions('team', {team_id for team_id, _ in teams})
+        bump_versions('league', {league_id for _, league_id in teams})
+        bump_versions('knockout', knockout_league_ids)
+        bump_versions('stadium', matches.values_list('stadium_id', flat=True).distinct())
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from matches.models import LocalLeague
+from matches.qualification import DEFAULT_TRIALS, simulate_league
+
+
+class Command(BaseCommand):
+    help = "Simulates the remaining group stage matches and stores the qualification probabilities of every team."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--league', help="Slug of the local league to simulate (default: every league)")
+        parser.add_argument('--trials', type=int, default=DEFAULT_TRIALS, help=f"Simulated season completions (default: {DEFAULT_TRIALS})")
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes sharing the trials (default: 1)")
+        parser.add_argument('--seed', type=int, help="Random seed, for reproducible results")
+
+    def handle(self, *args, **options):
+        if options['trials'] < 1:
+            raise CommandError("--trials must be at least 1")
+        leagues = LocalLeague.objects.all()
+        if options['league']:
+            leagues = leagues.filter(slug=options['league'])
+            if not leagues.exists():
+                raise CommandError(f"Unknown local league {options['league']}")
+        for league in leagues:
+            start = time.perf_counter()
+            rows = simulate_league(league, trials=options['trials'], workers=options['workers'], seed=options['seed'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{league.slug}: {rows} teams simulated over {options['trials']} trials in {time.perf_counter() - start:.2f}s."
+            ))
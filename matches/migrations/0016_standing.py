@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0015_alter_match_stage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Standing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('Ammichevole', 'Friendly'), ('Gironi', 'Group stage'), ('Ottavi', 'round-of-16'), ('Quarti', 'Quarter-finals'), ('Semi', 'Semi-finals'), ('Finale', 'Final'), ('Finali nazionali', 'National finals')], max_length=32, verbose_name='Tournament stage')),
+                ('played', models.PositiveSmallIntegerField(default=0, verbose_name='Finished matches played')),
+                ('points', models.PositiveSmallIntegerField(default=0, verbose_name='Points')),
+                ('regular_wins', models.PositiveSmallIntegerField(default=0, verbose_name='Wins in regular time')),
+                ('penalty_wins', models.PositiveSmallIntegerField(default=0, verbose_name='Wins at penalties')),
+                ('penalty_losses', models.PositiveSmallIntegerField(default=0, verbose_name='Losses at penalties')),
+                ('regular_losses', models.PositiveSmallIntegerField(default=0, verbose_name='Losses in regular time')),
+                ('draws', models.PositiveSmallIntegerField(default=0, verbose_name='Draws')),
+                ('goals_for', models.PositiveSmallIntegerField(default=0, verbose_name='Goals scored')),
+                ('goals_against', models.PositiveSmallIntegerField(default=0, verbose_name='Goals conceded')),
+                ('goal_difference', models.SmallIntegerField(default=0, verbose_name='Goal difference')),
+                ('local_league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='matches.localleague', verbose_name='Local league of the standings table')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='matches.team', verbose_name='Team to which the standings row belongs')),
+            ],
+            options={
+                'ordering': ['-points', '-goal_difference', '-goals_for'],
+                'indexes': [models.Index(fields=['local_league', 'stage', '-points', '-goal_difference'], name='standing_table_idx')],
+                'constraints': [models.UniqueConstraint(fields=('team', 'stage'), name='unique_team_stage_standing')],
+            },
+        ),
+    ]
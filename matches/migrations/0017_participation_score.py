@@ -0,0 +1,40 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:03
+
+from django.db import migrations, models
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def compute_scores(apps, schema_editor):
+    TeamParticipationMatch = apps.get_model('matches', 'TeamParticipationMatch')
+    MatchEvent = apps.get_model('matches', 'MatchEvent')
+    goals = MatchEvent.objects.filter(
+        team_match=OuterRef('pk'),
+        event_type='GOAL',
+    ).values('team_match').annotate(count=Count('pk')).values('count')
+    TeamParticipationMatch.objects.update(event_goals=Coalesce(Subquery(goals), Value(0)))
+    participations = TeamParticipationMatch.objects.all()
+    participations.filter(match__score_computation_mode='OFFSET').update(score=F('score_offset'))
+    participations.filter(match__score_computation_mode='EVENTS').update(score=F('event_goals'))
+    participations.filter(match__score_computation_mode='SUM').update(score=F('event_goals') + F('score_offset'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0016_standing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='teamparticipationmatch',
+            name='event_goals',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text='Number of GOAL events of this team, kept in sync when events change', verbose_name='Goals from events'),
+        ),
+        migrations.AddField(
+            model_name='teamparticipationmatch',
+            name='score',
+            field=models.SmallIntegerField(default=0, editable=False, help_text='Score according to the match score computation mode, kept in sync on save', verbose_name='Computed Score'),
+        ),
+        migrations.RunPython(compute_scores, migrations.RunPython.noop),
+    ]
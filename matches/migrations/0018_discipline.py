@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:09
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0017_participation_score'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='localleague',
+            name='red_card_suspension',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Matches of suspension for a red card'),
+        ),
+        migrations.AddField(
+            model_name='localleague',
+            name='yellow_cards_suspension',
+            field=models.PositiveSmallIntegerField(default=1, verbose_name='Matches of suspension for accumulated yellow cards'),
+        ),
+        migrations.AddField(
+            model_name='localleague',
+            name='yellow_cards_threshold',
+            field=models.PositiveSmallIntegerField(default=3, help_text='Every time a player reaches a multiple of this number of yellow cards they are suspended', validators=[django.core.validators.MinValueValidator(1, message='Threshold must be at least 1')], verbose_name='Yellow cards leading to a suspension'),
+        ),
+        migrations.CreateModel(
+            name='DisciplinaryRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('yellow_cards', models.PositiveSmallIntegerField(default=0, verbose_name='Yellow cards')),
+                ('red_cards', models.PositiveSmallIntegerField(default=0, verbose_name='Red cards')),
+                ('local_league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disciplinary_records', to='matches.localleague', verbose_name='Local league of the record')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disciplinary_records', to='matches.player', verbose_name='Player to which the record belongs')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('player', 'local_league'), name='unique_player_league_record')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Suspension',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('YELLOW_CARDS', 'Accumulated yellow cards'), ('RED_CARD', 'Red card')], max_length=15, verbose_name='Reason')),
+                ('matches', models.PositiveSmallIntegerField(verbose_name='Matches to be served')),
+                ('starts_after', models.DateTimeField(verbose_name='Starts after')),
+                ('ends_at', models.DateTimeField(blank=True, null=True, verbose_name='Ends with the match at')),
+                ('local_league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suspensions', to='matches.localleague', verbose_name='Local league of the suspension')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suspensions', to='matches.match', verbose_name='Match in which the suspension was triggered')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suspensions', to='matches.player', verbose_name='Suspended player')),
+                ('team', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suspensions', to='matches.team', verbose_name='Team whose matches are to be served')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['player', 'starts_after'], name='suspension_player_idx'), models.Index(fields=['team', 'starts_after'], name='suspension_team_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:09
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def compute_pair_keys(apps, schema_editor):
+    Match = apps.get_model('matches', 'Match')
+    TeamParticipationMatch = apps.get_model('matches', 'TeamParticipationMatch')
+    team_ids = defaultdict(list)
+    for match_id, team_id in TeamParticipationMatch.objects.values_list('match_id', 'team_id'):
+        team_ids[match_id].append(team_id)
+    matches = []
+    for match_id, ids in team_ids.items():
+        if len(ids) == 2:
+            ids.sort()
+            matches.append(Match(pk=match_id, pair_key=f"{ids[0]}-{ids[1]}"))
+    Match.objects.bulk_update(matches, ['pair_key'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0018_discipline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='pair_key',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, help_text="Ordered ids of the two teams (e.g. '3-7'), used to look up head-to-head matches", max_length=41, verbose_name='Team pair key'),
+        ),
+        migrations.RunPython(compute_pair_keys, migrations.RunPython.noop),
+    ]
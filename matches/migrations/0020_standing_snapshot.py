@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0019_match_pair_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StandingSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(choices=[('Ammichevole', 'Friendly'), ('Gironi', 'Group stage'), ('Ottavi', 'round-of-16'), ('Quarti', 'Quarter-finals'), ('Semi', 'Semi-finals'), ('Finale', 'Final'), ('Finali nazionali', 'National finals')], max_length=32, verbose_name='Tournament stage')),
+                ('date', models.DateField(verbose_name='Matchday')),
+                ('table', models.JSONField(default=list, verbose_name='Standings table')),
+                ('local_league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standing_snapshots', to='matches.localleague', verbose_name='Local league of the standings table')),
+            ],
+            options={
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('local_league', 'stage', 'date'), name='unique_league_stage_snapshot')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:15
+
+import matches.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0020_standing_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='localleague',
+            name='tiebreakers',
+            field=models.JSONField(blank=True, default=matches.models.default_tiebreakers, help_text='Ordered list of the rules applied to teams level on points: head_to_head_points, head_to_head_goal_difference, head_to_head_goals_for, goal_difference, goals_for, fair_play', validators=[matches.models.validate_tiebreakers], verbose_name='Standings tie-breakers'),
+        ),
+    ]
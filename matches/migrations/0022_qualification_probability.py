@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0021_localleague_tiebreakers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='localleague',
+            name='qualifying_teams',
+            field=models.PositiveSmallIntegerField(default=8, help_text='Number of top teams of the group stage table moving on to the knockout stage', verbose_name='Teams qualifying from the group stage'),
+        ),
+        migrations.CreateModel(
+            name='QualificationProbability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qualification', models.FloatField(verbose_name='Probability to qualify')),
+                ('positions', models.JSONField(default=list, verbose_name='Probability of each final position')),
+                ('trials', models.PositiveIntegerField(verbose_name='Simulated season completions')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Last simulation')),
+                ('local_league', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='qualification_probabilities', to='matches.localleague', verbose_name='Local league of the simulated table')),
+                ('team', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='qualification_probability', to='matches.team', verbose_name='Simulated team')),
+            ],
+            options={
+                'ordering': ['-qualification'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0022_qualification_probability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='rated',
+            field=models.BooleanField(default=False, editable=False, help_text='Set once the result of the finished match has been applied to the team ratings', verbose_name='Counted in the team ratings'),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='rating',
+            field=models.FloatField(default=1500, editable=False, help_text='Elo-style rating updated from every finished match, see matches.ratings', verbose_name='Power rating'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:19
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0023_team_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlackoutDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(verbose_name='First unavailable day')),
+                ('end_date', models.DateField(verbose_name='Last unavailable day')),
+                ('reason', models.CharField(blank=True, max_length=100, verbose_name='Reason')),
+                ('stadium', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='blackout_dates', to='matches.stadium', verbose_name='Unavailable stadium')),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='blackout_dates', to='matches.team', verbose_name='Unavailable team')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('stadium__isnull', True), ('team__isnull', False)), models.Q(('stadium__isnull', False), ('team__isnull', True)), _connector='OR'), name='blackout_team_or_stadium'), models.CheckConstraint(condition=models.Q(('end_date__gte', models.F('start_date'))), name='blackout_dates_ordered')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:21
+
+import django.core.validators
+import matches.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0024_blackout_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='duration',
+            field=models.PositiveSmallIntegerField(default=matches.models.default_match_duration, help_text='Time the stadium is booked for the match, starting from its date and time', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(240)], verbose_name='Slot duration (minutes)'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['stadium', 'datetime'], name='match_stadium_datetime_idx'),
+        ),
+    ]
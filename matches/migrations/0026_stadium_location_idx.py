@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0025_match_duration'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stadium',
+            index=models.Index(fields=['latitude', 'longitude'], name='stadium_location_idx'),
+        ),
+    ]
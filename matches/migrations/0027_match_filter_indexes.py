@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0026_stadium_location_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['-datetime'], name='match_datetime_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['stage', 'datetime'], name='match_stage_datetime_idx'),
+        ),
+    ]
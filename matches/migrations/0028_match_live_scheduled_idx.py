@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0027_match_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(condition=models.Q(('status', 'LIVE')), fields=['datetime'], name='match_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(condition=models.Q(('status', 'SCHEDULED')), fields=['datetime'], name='match_scheduled_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('matches', '0028_match_live_scheduled_idx'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='news',
+            options={'ordering': ['-date']},
+        ),
+        migrations.AddIndex(
+            model_name='matchevent',
+            index=models.Index(fields=['team_match', 'event_type'], name='event_team_match_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='news',
+            index=models.Index(fields=['local_league', '-date'], name='news_league_date_idx'),
+        ),
+    ]
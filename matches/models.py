@@ -1,13 +1,39 @@
-from functools import cached_property
-from django.db import models
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.contrib import admin
 from .custom_fields import SVGAndImageField
 
 from backend_django.storage_backends import PublicMediaStorage
 # from location_field.models.plain import PlainLocationField
 
 # Create your models here.
+# Rules applied in order to teams level on points, see matches.tiebreakers.
+TIEBREAKERS = {
+    'head_to_head_points': "Points in the matches between the tied teams",
+    'head_to_head_goal_difference': "Goal difference in the matches between the tied teams",
+    'head_to_head_goals_for': "Goals scored in the matches between the tied teams",
+    'goal_difference': "Overall goal difference",
+    'goals_for': "Overall goals scored",
+    'fair_play': "Fewer disciplinary points (1 per yellow card, 3 per red card)",
+}
+
+def default_tiebreakers():
+    return ['head_to_head_points', 'head_to_head_goal_difference', 'goal_difference', 'goals_for', 'fair_play']
+
+def validate_tiebreakers(value):
+    if not isinstance(value, list):
+        raise ValidationError("Tie-breakers must be a list of rule names")
+    unknown = [rule for rule in value if rule not in TIEBREAKERS]
+    if unknown:
+        raise ValidationError(f"Unknown tie-breakers: {', '.join(map(str, unknown))}. Valid rules: {', '.join(TIEBREAKERS)}")
+    if len(set(value)) != len(value):
+        raise ValidationError("Each tie-breaker can be used only once")
+
 class LocalLeague(models.Model):
     slug = models.SlugField(
         "Unique slug", 
@@ -21,10 +47,71 @@ class LocalLeague(models.Model):
     socials = models.JSONField("Social media handles", blank=True, default=dict)
     logo = models.ImageField("League logo", upload_to='league_logos/', storage=PublicMediaStorage, blank=True, null=True)
     background = models.ImageField("League page background", upload_to='league_backgrounds/', storage=PublicMediaStorage, blank=True, null=True)
+    yellow_cards_threshold = models.PositiveSmallIntegerField(
+        "Yellow cards leading to a suspension",
+        default=3,
+        validators=[MinValueValidator(1, message="Threshold must be at least 1")],
+        help_text="Every time a player reaches a multiple of this number of yellow cards they are suspended"
+    )
+    yellow_cards_suspension = models.PositiveSmallIntegerField("Matches of suspension for accumulated yellow cards", default=1)
+    red_card_suspension = models.PositiveSmallIntegerField("Matches of suspension for a red card", default=1)
+    qualifying_teams = models.PositiveSmallIntegerField(
+        "Teams qualifying from the group stage",
+        default=8,
+        help_text="Number of top teams of the group stage table moving on to the knockout stage"
+    )
+    tiebreakers = models.JSONField(
+        "Standings tie-breakers",
+        default=default_tiebreakers,
+        blank=True,
+        validators=[validate_tiebreakers],
+        help_text="Ordered list of the rules applied to teams level on points: " + ", ".join(TIEBREAKERS)
+    )
 
     def __str__(self):
         return f"LocalLeague <{self.slug}>: {self.name}"
     
+class TeamQuerySet(models.QuerySet):
+    def with_standings(self, stage='Gironi', until=None):
+        """
+        Annotates each team with its standings in the given stage, computed in SQL in a single query:
+        played, regular_wins, penalty_wins, penalty_losses, regular_losses, draws,
+        goals_for, goals_against, goal_difference and points.
+        Each participation in a finished match is joined to the opponent participation of the same match,
+        whose stored score already honours the match score computation mode.
+        Negative scores (an offset below the goals) count as no goals, as in matches.standings.compute_standings.
+        With until (a date) only the matches played up to that day are counted.
+        """
+        mine = 'match_participations'
+        theirs = 'match_participations__match__participations'
+        counted = Q(**{
+            f'{mine}__match__status': 'FT',
+            f'{mine}__match__stage': stage,
+            f'{theirs}__isnull': False,
+        }) & ~Q(**{f'{theirs}__pk': F(f'{mine}__pk')})
+        if until is not None:
+            counted &= Q(**{f'{mine}__match__datetime__date__lte': until})
+        tied = Q(**{f'{mine}__score': F(f'{theirs}__score')})
+        won_penalties = Q(**{f'{mine}__penalties__gt': F(f'{theirs}__penalties')})
+        lost_penalties = Q(**{f'{mine}__penalties__lt': F(f'{theirs}__penalties')})
+        return self.annotate(
+            played=Count(mine, filter=counted),
+            regular_wins=Count(mine, filter=counted & Q(**{f'{mine}__score__gt': F(f'{theirs}__score')})),
+            penalty_wins=Count(mine, filter=counted & tied & won_penalties),
+            penalty_losses=Count(mine, filter=counted & tied & lost_penalties),
+            regular_losses=Count(mine, filter=counted & Q(**{f'{mine}__score__lt': F(f'{theirs}__score')})),
+            draws=Count(mine, filter=counted & tied & ~won_penalties & ~lost_penalties),
+            goals_for=Coalesce(Sum(Greatest(f'{mine}__score', Value(0)), filter=counted), 0),
+            goals_against=Coalesce(Sum(Greatest(f'{theirs}__score', Value(0)), filter=counted), 0),
+        ).annotate(
+            goal_difference=F('goals_for') - F('goals_against'),
+            points=(
+                F('regular_wins') * TeamParticipationMatch.POINTS_BY_RESULT['REGULAR_WIN']
+                + F('penalty_wins') * TeamParticipationMatch.POINTS_BY_RESULT['PENALTY_WIN']
+                + F('penalty_losses') * TeamParticipationMatch.POINTS_BY_RESULT['PENALTY_LOSS']
+            ),
+        )
+
 class Team(models.Model):
     slug = models.SlugField(
         "Unique slug",
@@ -42,30 +129,52 @@ class Team(models.Model):
         related_name='teams',
         verbose_name="Local league to which the team belongs"
     )
+    rating = models.FloatField(
+        "Power rating",
+        default=1500,
+        editable=False,
+        help_text="Elo-style rating updated from every finished match, see matches.ratings"
+    )
+
+    objects = TeamQuerySet.as_manager()
+
+    def standing(self, stage='Gironi'):
+        """Returns the persisted standings row of the team for the given stage, if any."""
+        for standing in self.standings.all():
+            if standing.stage == stage:
+                return standing
+        return None
 
     @property
     def pts(self):
-        """Calculates total points from all finished matches."""
-        return sum(p.points for p in self.match_participations.all() if p.match.finished and p.match.stage == 'Gironi')
+        """
+        Total points from all finished group stage matches, read from the persisted standings.
+        Teams fetched with Team.objects.with_standings() use the annotated points instead.
+        """
+        if hasattr(self, 'points'):
+            return self.points
+        standing = self.standing('Gironi')
+        return standing.points if standing else 0
 
     @property
     def record(self):
-        """Calculates the win-draw-loss record."""
+        """The win-draw-loss record over every stage, read from the persisted standings."""
         r_wins = p_wins = p_losses = r_losses = 0
-        for p in self.match_participations.all():
-            if not p.match.finished:
-                continue
-            res = p.result_type
-            if res == 'REGULAR_WIN':
-                r_wins += 1
-            elif res == 'PENALTY_WIN':
-                p_wins += 1
-            elif res == 'PENALTY_LOSS':
-                p_losses += 1
-            elif res == 'REGULAR_LOSS':
-                r_losses += 1
+        for standing in self.standings.all():
+            r_wins += standing.regular_wins
+            p_wins += standing.penalty_wins
+            p_losses += standing.penalty_losses
+            r_losses += standing.regular_losses
         return f"{r_wins}V - {p_wins}VR - {p_losses}SR - {r_losses}S"
 
+    @property
+    def form(self):
+        """Letters of the last results of the team, most recent first (W, PW, PL, L or D), see matches.team_form."""
+        if not hasattr(self, '_form'):
+            from .team_form import attach_forms
+            attach_forms([self])
+        return [entry['result'] for entry in self._form]
+
     def __str__(self):
         return f"Team <{self.slug}>: {self.name} in local league <{self.local_league.slug}>"
     
@@ -115,6 +224,10 @@ class Player(models.Model):
         verbose_name="Team to which the player belongs"
     )
 
+    def is_eligible_for(self, match):
+        """Returns False if a suspension window of the player covers the given match (single indexed query)."""
+        return not self.suspensions.active_for(match).exists()
+
     def __str__(self):
         return f"Player <{self.id}>: {self.first_name} {self.last_name} (#{self.shirt_number}) in team <{self.team.slug}>"
     
@@ -129,9 +242,40 @@ class Stadium(models.Model):
         verbose_name="Local leagues that use this stadium"
     )
 
+    class Meta:
+        indexes = [
+            # bounding box prefilter of the nearby search, see matches.geo
+            models.Index(fields=['latitude', 'longitude'], name='stadium_location_idx'),
+        ]
+
     def __str__(self):
         return f"Stadium <{self.id}>: {self.name}"
 
+class TeamParticipationMatchQuerySet(models.QuerySet):
+    # score expression for each match score computation mode, see TeamParticipationMatch.compute_score
+    SCORE_EXPRESSIONS = {
+        'OFFSET': F('score_offset'),
+        'EVENTS': F('event_goals'),
+        'SUM': F('event_goals') + F('score_offset'),
+    }
+
+    def with_opponents(self):
+        """
+        Fetches the match and both its participations (with their stored score and penalties) in bulk,
+        so opponent_participation, is_winner, result_type and points cost no query per row.
+        """
+        return self.select_related('match').prefetch_related('match__participations')
+
+    def refresh_scores(self):
+        """Recounts the goal events and recomputes the stored score of the participations in this queryset."""
+        goals = MatchEvent.objects.filter(
+            team_match=OuterRef('pk'),
+            event_type='GOAL',
+        ).values('team_match').annotate(count=Count('pk')).values('count')
+        self.update(event_goals=Coalesce(Subquery(goals), Value(0)))
+        for mode, expression in self.SCORE_EXPRESSIONS.items():
+            self.filter(match__score_computation_mode=mode).update(score=expression)
+
 class TeamParticipationMatch(models.Model):
     team = models.ForeignKey(
         Team,
@@ -155,55 +299,65 @@ class TeamParticipationMatch(models.Model):
         "Penalties scored by this team",
         default=0,
     )
-
-    @cached_property
-    @admin.display(
-        description="Computed Score",
-        boolean=False,
+    event_goals = models.PositiveSmallIntegerField(
+        "Goals from events",
+        default=0,
+        editable=False,
+        help_text="Number of GOAL events of this team, kept in sync when events change"
     )
-    def score(self):
-        match = self.match
-        if match.score_computation_mode == 'OFFSET':
+    score = models.SmallIntegerField(
+        "Computed Score",
+        default=0,
+        editable=False,
+        help_text="Score according to the match score computation mode, kept in sync on save"
+    )
+
+    objects = TeamParticipationMatchQuerySet.as_manager()
+
+    def compute_score(self):
+        """Computes the score from the stored event goals, the offset and the match score computation mode."""
+        mode = self.match.score_computation_mode
+        if mode == 'OFFSET':
             return self.score_offset
-        if hasattr(self, '_prefetched_objects_cache') and 'events' in self._prefetched_objects_cache:
-            event_goals = sum(1 for e in self.events.all() if e.event_type == 'GOAL')
-        else:
-            event_goals = self.events.filter(event_type='GOAL').count()
-        if match.score_computation_mode == 'EVENTS':
-            return event_goals
-        if match.score_computation_mode == 'SUM':
-            return event_goals + self.score_offset
+        if mode == 'EVENTS':
+            return self.event_goals
+        if mode == 'SUM':
+            return self.event_goals + self.score_offset
         return 0
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            if self.pk is not None:
+                # recount to avoid writing back a stale value loaded before the events changed
+                self.event_goals = self.events.filter(event_type='GOAL').count()
+            self.score = self.compute_score()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'event_goals', 'score'}
+            super().save(*args, **kwargs)
     
     @property
     def opponent_participation(self):
-        """Helper to get the other team's participation in the same match."""
-        return self.match.participations.exclude(id=self.id).first()
+        """
+        Helper to get the other team's participation in the same match.
+        Uses the match participations when prefetched (see TeamParticipationMatchQuerySet.with_opponents).
+        """
+        match = self.match
+        if 'participations' in getattr(match, '_prefetched_objects_cache', {}):
+            return next((p for p in match.participations.all() if p.id != self.id), None)
+        return match.participations.exclude(id=self.id).first()
     
     @property
     def is_winner(self):
         """Returns True if this team won the match (regular time or penalties)."""
-        opponent = self.opponent_participation
-        if not opponent:
-            return False # Should not happen in valid match
-        
-        my_score = self.score
-        op_score = opponent.score
+        return self.result_type in ('REGULAR_WIN', 'PENALTY_WIN')
 
-        if my_score > op_score:
-            return True
-        elif my_score == op_score:
-            return self.penalties > opponent.penalties
-        return False
-
-    @property
-    def result_type(self):
+    def result_against(self, opponent):
         """
-        Returns the type of result:
+        Returns the type of result of this participation against the given opponent participation:
         'REGULAR_WIN' (3 pts), 'PENALTY_WIN' (2 pts), 
         'PENALTY_LOSS' (1 pt), 'REGULAR_LOSS' (0 pts)
         """
-        opponent = self.opponent_participation
         if not opponent:
             return None
 
@@ -223,6 +377,18 @@ class TeamParticipationMatch(models.Model):
             else:
                 return 'DRAW' # rare case if penalties are equal or not used
 
+    @property
+    def result_type(self):
+        """Returns the type of result against the other team of the match (see result_against)."""
+        return self.result_against(self.opponent_participation)
+
+    POINTS_BY_RESULT = {
+        'REGULAR_WIN': 3,
+        'PENALTY_WIN': 2,
+        'PENALTY_LOSS': 1,
+        'REGULAR_LOSS': 0,
+    }
+
     @property
     def points(self):
         """
@@ -232,14 +398,7 @@ class TeamParticipationMatch(models.Model):
         1 for loss at penalties
         0 for loss at regular time
         """
-        res = self.result_type
-        if res == 'REGULAR_WIN':
-            return 3
-        elif res == 'PENALTY_WIN':
-            return 2
-        elif res == 'PENALTY_LOSS':
-            return 1
-        return 0
+        return self.POINTS_BY_RESULT.get(self.result_type, 0)
 
     class Meta:
         constraints = [
@@ -252,12 +411,34 @@ class TeamParticipationMatch(models.Model):
         home_away = "Home" if self.is_home else "Away"
         return f"TeamParticipationMatch <{self.id}>: {home_away} team <{self.team.slug}> in match <{self.match.name}>"
 
+# Upper bound of Match.duration, which lets the stadium conflict lookup be a bounded range query.
+MAX_MATCH_DURATION = 240
+
+def default_match_duration():
+    return settings.MATCH_SLOT_MINUTES
+
 class Match(models.Model):
     class Meta:
         verbose_name_plural = "Matches"
         ordering = ['-datetime']
+        indexes = [
+            models.Index(fields=['stadium', 'datetime'], name='match_stadium_datetime_idx'),
+            # default ordering and the stage and date range filters (see matches.filters)
+            models.Index(fields=['-datetime'], name='match_datetime_idx'),
+            models.Index(fields=['stage', 'datetime'], name='match_stage_datetime_idx'),
+            # the status filter, selective for live and scheduled matches only: small partial indexes,
+            # also polled by the live and upcoming matches lists (see matches.live)
+            models.Index(fields=['datetime'], condition=models.Q(status='LIVE'), name='match_live_idx'),
+            models.Index(fields=['datetime'], condition=models.Q(status='SCHEDULED'), name='match_scheduled_idx'),
+        ]
 
     datetime = models.DateTimeField("Match date and time")
+    duration = models.PositiveSmallIntegerField(
+        "Slot duration (minutes)",
+        default=default_match_duration,
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_MATCH_DURATION)],
+        help_text="Time the stadium is booked for the match, starting from its date and time"
+    )
     teams = models.ManyToManyField(
         Team,
         related_name='matches',
@@ -284,6 +465,8 @@ class Match(models.Model):
         ('Finale', 'Final'),
         ('Finali nazionali', 'National finals'),
     ]
+    # knockout rounds played within a local league, in bracket order
+    KNOCKOUT_STAGES = ['Ottavi', 'Quarti', 'Semi', 'Finale']
     stage = models.CharField(
         "Tournament stage",
         max_length=32,
@@ -318,6 +501,34 @@ class Match(models.Model):
         default='EVENTS',
         help_text="Method to compute the displayed score"
     )
+    pair_key = models.CharField(
+        "Team pair key",
+        max_length=41,
+        blank=True,
+        default='',
+        editable=False,
+        db_index=True,
+        help_text="Ordered ids of the two teams (e.g. '3-7'), used to look up head-to-head matches"
+    )
+    rated = models.BooleanField(
+        "Counted in the team ratings",
+        default=False,
+        editable=False,
+        help_text="Set once the result of the finished match has been applied to the team ratings"
+    )
+
+    @staticmethod
+    def pair_key_for(team_ids):
+        """Returns the pair key of a match between the given teams ('' unless there are exactly two)."""
+        team_ids = sorted(team_ids)
+        if len(team_ids) != 2:
+            return ''
+        return f"{team_ids[0]}-{team_ids[1]}"
+
+    def refresh_pair_key(self):
+        """Recomputes and stores the pair key from the current participations."""
+        self.pair_key = self.pair_key_for(self.participations.values_list('team_id', flat=True))
+        Match.objects.filter(pk=self.pk).update(pair_key=self.pair_key)
 
     @property
     def isLive(self):
@@ -327,13 +538,30 @@ class Match(models.Model):
     def finished(self):
         return self.status == 'FT'
 
+    def home_and_away(self):
+        """
+        Returns the (home, away) participations, or None if the match does not have exactly two teams.
+        Computed in memory from the prefetched participations when available (prefetch 'participations__team'),
+        otherwise fetched together with their teams in a single query.
+        """
+        if 'participations' in getattr(self, '_prefetched_objects_cache', {}):
+            participations = list(self.participations.all())
+        else:
+            participations = list(self.participations.select_related('team'))
+        if len(participations) != 2:
+            return None
+        home_team = next((p for p in participations if p.is_home), None)
+        away_team = next((p for p in participations if not p.is_home), None)
+        if home_team is None or away_team is None:
+            return None
+        return home_team, away_team
+
     @property
     def score_text(self):
-        participations = self.participations.all()
-        if participations.count() != 2:
+        teams = self.home_and_away()
+        if teams is None:
             return "N/A"
-        home_team = participations.get(is_home=True)
-        away_team = participations.get(is_home=False)
+        home_team, away_team = teams
         if home_team.score is None or away_team.score is None:
             return "N/A"
         if home_team.score == away_team.score and (home_team.penalties > 0 or away_team.penalties > 0):
@@ -342,13 +570,31 @@ class Match(models.Model):
     
     @property
     def name(self):
-        participations = self.participations.all()
-        if participations.count() != 2:
+        teams = self.home_and_away()
+        if teams is None:
             return "N/A"
-        home_team = participations.get(is_home=True)
-        away_team = participations.get(is_home=False)
+        home_team, away_team = teams
         return f"{home_team.team.name} vs {away_team.team.name}"
 
+    @property
+    def ends_at(self):
+        """End of the stadium slot booked by the match."""
+        return self.datetime + timedelta(minutes=self.duration)
+
+    def clean(self):
+        super().clean()
+        if self.stadium_id and self.datetime and self.duration:
+            from .conflicts import overlapping_matches
+            conflicts = overlapping_matches(self.stadium_id, self.datetime, self.ends_at, exclude_pk=self.pk)
+            if conflicts:
+                raise ValidationError({'datetime': "The stadium is already booked by " + ", ".join(
+                    f"match {m.id} ({m.datetime:%Y-%m-%d %H:%M}-{m.ends_at:%H:%M})" for m in conflicts
+                )})
+
+    def save(self, *args, **kwargs):
+        # the signal handlers keeping scores and standings in sync run in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Match <{self.id}>: {self.name} on {self.datetime.strftime('%Y-%m-%d %H:%M')}"
@@ -391,9 +637,174 @@ class MatchEvent(models.Model):
         help_text="Select the type of event"
     )
 
+    def save(self, *args, **kwargs):
+        # the signal handlers keeping scores and standings in sync run in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # events of a type (goals, cards) of the given participations
+            models.Index(fields=['team_match', 'event_type'], name='event_team_match_type_idx'),
+        ]
+
     def __str__(self):
         return f"MatchEvent <{self.id}>: {self.event_type} at minute {self.minute} in match {self.team_match.match.id} for team {self.team_match.team.slug}"
     
+class Standing(models.Model):
+    """
+    Persisted standings row of a team in a tournament stage.
+    Kept up to date by the signal handlers in matches.signals, see matches.standings.refresh_standings.
+    """
+    local_league = models.ForeignKey(
+        LocalLeague,
+        on_delete=models.CASCADE,
+        related_name='standings',
+        verbose_name="Local league of the standings table"
+    )
+    team = models.ForeignKey(
+        Team,
+        on_delete=models.CASCADE,
+        related_name='standings',
+        verbose_name="Team to which the standings row belongs"
+    )
+    stage = models.CharField("Tournament stage", max_length=32, choices=Match.STAGES_CHOICES)
+    played = models.PositiveSmallIntegerField("Finished matches played", default=0)
+    points = models.PositiveSmallIntegerField("Points", default=0)
+    regular_wins = models.PositiveSmallIntegerField("Wins in regular time", default=0)
+    penalty_wins = models.PositiveSmallIntegerField("Wins at penalties", default=0)
+    penalty_losses = models.PositiveSmallIntegerField("Losses at penalties", default=0)
+    regular_losses = models.PositiveSmallIntegerField("Losses in regular time", default=0)
+    draws = models.PositiveSmallIntegerField("Draws", default=0)
+    goals_for = models.PositiveSmallIntegerField("Goals scored", default=0)
+    goals_against = models.PositiveSmallIntegerField("Goals conceded", default=0)
+    goal_difference = models.SmallIntegerField("Goal difference", default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['team', 'stage'], name='unique_team_stage_standing'),
+        ]
+        indexes = [
+            models.Index(fields=['local_league', 'stage', '-points', '-goal_difference'], name='standing_table_idx'),
+        ]
+        ordering = ['-points', '-goal_difference', '-goals_for']
+
+    @property
+    def record(self):
+        return f"{self.regular_wins}V - {self.penalty_wins}VR - {self.penalty_losses}SR - {self.regular_losses}S"
+
+    def __str__(self):
+        return f"Standing <{self.id}>: team <{self.team_id}> in stage {self.stage} with {self.points} pts"
+
+
+class StandingSnapshot(models.Model):
+    """
+    Standings table of a local league stage as it was at the end of a matchday.
+    One snapshot per day with finished matches, see matches.standings.refresh_snapshots.
+    table holds the rows in ranking order as compact dicts (position, team slug and figures).
+    """
+    local_league = models.ForeignKey(
+        LocalLeague,
+        on_delete=models.CASCADE,
+        related_name='standing_snapshots',
+        verbose_name="Local league of the standings table"
+    )
+    stage = models.CharField("Tournament stage", max_length=32, choices=Match.STAGES_CHOICES)
+    date = models.DateField("Matchday")
+    table = models.JSONField("Standings table", default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['local_league', 'stage', 'date'], name='unique_league_stage_snapshot'),
+        ]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"StandingSnapshot <{self.local_league_id}> {self.stage} {self.date}"
+
+class DisciplinaryRecord(models.Model):
+    """Cards collected by a player in a local league, maintained by matches.discipline.refresh_discipline."""
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='disciplinary_records',
+        verbose_name="Player to which the record belongs"
+    )
+    local_league = models.ForeignKey(
+        LocalLeague,
+        on_delete=models.CASCADE,
+        related_name='disciplinary_records',
+        verbose_name="Local league of the record"
+    )
+    yellow_cards = models.PositiveSmallIntegerField("Yellow cards", default=0)
+    red_cards = models.PositiveSmallIntegerField("Red cards", default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'local_league'], name='unique_player_league_record'),
+        ]
+
+    def __str__(self):
+        return f"DisciplinaryRecord <{self.id}>: player <{self.player_id}> with {self.yellow_cards} yellow and {self.red_cards} red cards"
+
+class SuspensionQuerySet(models.QuerySet):
+    def active_for(self, match):
+        """Suspensions whose window covers the given match."""
+        return self.filter(
+            models.Q(ends_at__isnull=True) | models.Q(ends_at__gte=match.datetime),
+            starts_after__lt=match.datetime,
+        )
+
+class Suspension(models.Model):
+    """
+    Suspension window of a player, maintained by matches.discipline.refresh_discipline.
+    The player cannot play the matches of the team scheduled after starts_after and until ends_at,
+    the datetime of the last match to be served (null while not all of them are scheduled).
+    """
+    REASONS = [
+        ('YELLOW_CARDS', 'Accumulated yellow cards'),
+        ('RED_CARD', 'Red card'),
+    ]
+    player = models.ForeignKey(
+        Player,
+        on_delete=models.CASCADE,
+        related_name='suspensions',
+        verbose_name="Suspended player"
+    )
+    local_league = models.ForeignKey(
+        LocalLeague,
+        on_delete=models.CASCADE,
+        related_name='suspensions',
+        verbose_name="Local league of the suspension"
+    )
+    team = models.ForeignKey(
+        Team,
+        on_delete=models.CASCADE,
+        related_name='suspensions',
+        verbose_name="Team whose matches are to be served"
+    )
+    match = models.ForeignKey(
+        Match,
+        on_delete=models.CASCADE,
+        related_name='suspensions',
+        verbose_name="Match in which the suspension was triggered"
+    )
+    reason = models.CharField("Reason", max_length=15, choices=REASONS)
+    matches = models.PositiveSmallIntegerField("Matches to be served")
+    starts_after = models.DateTimeField("Starts after")
+    ends_at = models.DateTimeField("Ends with the match at", null=True, blank=True)
+
+    objects = SuspensionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['player', 'starts_after'], name='suspension_player_idx'),
+            models.Index(fields=['team', 'starts_after'], name='suspension_team_idx'),
+        ]
+
+    def __str__(self):
+        return f"Suspension <{self.id}>: player <{self.player_id}> for {self.matches} matches after match <{self.match_id}>"
+
 class News(models.Model):
     slug = models.SlugField(
         "Unique slug", 
@@ -417,4 +828,78 @@ class News(models.Model):
     author = models.CharField("Author name", max_length=100, blank=True)
     tags = models.CharField("Comma-separated tags", max_length=200, blank=True)
 
+    class Meta:
+        # newest first, the league news list is a range read on the index
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['local_league', '-date'], name='news_league_date_idx'),
+        ]
+
+class QualificationProbability(models.Model):
+    """
+    Simulated chances of a team to qualify from the group stage and to finish in each position.
+    Written by the simulate_qualification management command, see matches.simulation.
+    """
+    local_league = models.ForeignKey(
+        LocalLeague,
+        on_delete=models.CASCADE,
+        related_name='qualification_probabilities',
+        verbose_name="Local league of the simulated table"
+    )
+    team = models.OneToOneField(
+        Team,
+        on_delete=models.CASCADE,
+        related_name='qualification_probability',
+        verbose_name="Simulated team"
+    )
+    qualification = models.FloatField("Probability to qualify")
+    positions = models.JSONField("Probability of each final position", default=list)
+    trials = models.PositiveIntegerField("Simulated season completions")
+    updated_at = models.DateTimeField("Last simulation", auto_now=True)
+
+    class Meta:
+        ordering = ['-qualification']
+
+    def __str__(self):
+        return f"QualificationProbability <{self.team_id}>: {self.qualification:.1%}"
+
+
+class BlackoutDate(models.Model):
+    """Days on which a team cannot play or a stadium is not available, honoured by the fixture generator."""
+    team = models.ForeignKey(
+        Team,
+        on_delete=models.CASCADE,
+        related_name='blackout_dates',
+        verbose_name="Unavailable team",
+        null=True,
+        blank=True,
+    )
+    stadium = models.ForeignKey(
+        Stadium,
+        on_delete=models.CASCADE,
+        related_name='blackout_dates',
+        verbose_name="Unavailable stadium",
+        null=True,
+        blank=True,
+    )
+    start_date = models.DateField("First unavailable day")
+    end_date = models.DateField("Last unavailable day")
+    reason = models.CharField("Reason", max_length=100, blank=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=Q(team__isnull=False, stadium__isnull=True) | Q(team__isnull=True, stadium__isnull=False),
+                name='blackout_team_or_stadium',
+            ),
+            models.CheckConstraint(condition=Q(end_date__gte=F('start_date')), name='blackout_dates_ordered'),
+        ]
 
+    def clean(self):
+        if (self.team_id is None) == (self.stadium_id is None):
+            raise ValidationError("Select either a team or a stadium.")
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError({'end_date': "The last day cannot precede the first one."})
+
+    def __str__(self):
+        return f"BlackoutDate <{self.team_id or self.stadium_id}>: {self.start_date} - {self.end_date}"
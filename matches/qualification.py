@@ -0,0 +1,83 @@
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+
+from .models import QualificationProbability, Team, TeamParticipationMatch
+from .simulation import run_trials
+
+DEFAULT_TRIALS = 20000
+# Weight, in matches, of the league average when estimating the scoring rates of the teams.
+PRIOR_MATCHES = 3
+# Goals per team per match assumed before any match is played.
+DEFAULT_GOALS = 1.5
+
+
+def load_inputs(local_league, stage='Gironi'):
+    """
+    Current table and remaining fixtures of a league stage, as NumPy arrays for matches.simulation.
+    The table counts the finished matches and the remaining fixtures are the scheduled ones: matches being
+    played are left out until they finish, rather than being replayed from 0-0.
+    Each side of a remaining fixture scores at a rate given by its attack and the opponent's defence,
+    both estimated from the finished matches and shrunk towards the league average.
+    """
+    teams = list(Team.objects.filter(local_league=local_league).with_standings(stage).values(
+        'id', 'played', 'points', 'goal_difference', 'goals_for', 'goals_against',
+    ).order_by('id'))
+    index = {team['id']: i for i, team in enumerate(teams)}
+
+    remaining = defaultdict(dict)
+    participations = TeamParticipationMatch.objects.filter(
+        team__local_league=local_league,
+        match__stage=stage,
+        match__status='SCHEDULED',
+    ).values_list('match_id', 'team_id', 'is_home')
+    for match_id, team_id, is_home in participations:
+        remaining[match_id][is_home] = index[team_id]
+    fixtures = np.array(
+        [(sides[True], sides[False]) for sides in remaining.values() if len(sides) == 2],
+        dtype=np.intp,
+    ).reshape(-1, 2)
+
+    def column(field):
+        return np.array([team[field] for team in teams], dtype=float)
+
+    played, goals_for, goals_against = column('played'), column('goals_for'), column('goals_against')
+    average = goals_for.sum() / played.sum() if played.sum() else DEFAULT_GOALS
+    average = max(average, 0.1)
+    attack = (goals_for + average * PRIOR_MATCHES) / (played + PRIOR_MATCHES) / average
+    defence = (goals_against + average * PRIOR_MATCHES) / (played + PRIOR_MATCHES) / average
+    home, away = fixtures.T
+    return [team['id'] for team in teams], {
+        'fixtures': fixtures,
+        'points': column('points'),
+        'goal_difference': column('goal_difference'),
+        'goals_for': goals_for,
+        'home_rates': average * attack[home] * defence[away],
+        'away_rates': average * attack[away] * defence[home],
+        'points_by_result': TeamParticipationMatch.POINTS_BY_RESULT,
+    }
+
+
+def simulate_league(local_league, trials=DEFAULT_TRIALS, workers=1, seed=None):
+    """Simulates the completion of the group stage of a league and replaces its qualification probabilities."""
+    team_ids, inputs = load_inputs(local_league)
+    if not team_ids:
+        return 0
+    counts = run_trials(inputs, trials, workers=workers, seed=seed)
+    probabilities = counts / trials
+    qualifying = min(local_league.qualifying_teams, len(team_ids))
+    rows = [
+        QualificationProbability(
+            local_league=local_league,
+            team_id=team_id,
+            qualification=float(probabilities[i, :qualifying].sum()),
+            positions=[round(float(p), 4) for p in probabilities[i]],
+            trials=trials,
+        )
+        for i, team_id in enumerate(team_ids)
+    ]
+    with transaction.atomic():
+        QualificationProbability.objects.filter(local_league=local_league).delete()
+        QualificationProbability.objects.bulk_create(rows)
+    return len(rows)
@@ -0,0 +1,135 @@
+import threading
+
+import numpy as np
+from django.db import transaction
+
+from .models import Match, Team, TeamParticipationMatch
+
+INITIAL_RATING = 1500
+K_FACTOR = 32
+# Friendlies do not count towards the ratings.
+EXCLUDED_STAGES = ['Ammichevole']
+# Score of a result in the Elo update: a win at penalties is worth less than a win in regular time.
+RESULT_SCORES = {
+    'REGULAR_WIN': 1.0,
+    'PENALTY_WIN': 0.75,
+    'DRAW': 0.5,
+    'PENALTY_LOSS': 0.25,
+    'REGULAR_LOSS': 0.0,
+}
+
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def rate_match(match_id):
+    """
+    Applies the result of a finished match to the ratings of its two teams, once.
+    Ratings are a single scale shared by every local league, so national finals compare teams across leagues.
+    """
+    with transaction.atomic():
+        match = Match.objects.select_for_update().filter(
+            pk=match_id, status='FT', rated=False,
+        ).exclude(stage__in=EXCLUDED_STAGES).first()
+        if match is None:
+            return False
+        participations = list(match.participations.select_related('team').select_for_update())
+        if len(participations) != 2:
+            return False
+        home, away = participations
+        delta = K_FACTOR * (
+            RESULT_SCORES[home.result_against(away)] - expected_score(home.team.rating, away.team.rating)
+        )
+        Team.objects.filter(pk=home.team_id).update(rating=home.team.rating + delta)
+        Team.objects.filter(pk=away.team_id).update(rating=away.team.rating - delta)
+        Match.objects.filter(pk=match_id).update(rated=True)
+    return True
+
+
+_pending = threading.local()
+
+
+def schedule_rating(match_id):
+    """
+    Rates a finished match once the current transaction commits (see rate_match), so the participations
+    and events saved after the match in the same transaction (the inlines of the admin form) are part of its result.
+    """
+    transaction.on_commit(lambda: rate_match(match_id))
+
+
+def schedule_replay():
+    """
+    Replays the whole history of ratings (rebuild_all_ratings) once the current transaction commits,
+    after the result of a rated match changed: its update also changed every later rating of its teams.
+    Several changes within the same transaction are replayed once.
+    """
+    _pending.replay = True
+    transaction.on_commit(_replay_pending)
+
+
+def _replay_pending():
+    if getattr(_pending, 'replay', False):
+        _pending.replay = False
+        rebuild_all_ratings()
+
+
+def replay_ratings(home, away, home_scores, team_count):
+    """
+    Replays ordered match results and returns the final rating of every team.
+    home and away are the team indexes of each match and home_scores its result score for the home team.
+    Matches are grouped into waves in which each team plays at most once, keeping the order of the matches
+    of every team, so each wave is updated as a single vectorized step with the same result as a match by
+    match replay.
+    """
+    ratings = np.full(team_count, INITIAL_RATING, dtype=float)
+    if not len(home):
+        return ratings
+    last_wave = np.full(team_count, -1)
+    waves = np.empty(len(home), dtype=int)
+    for i, (h, a) in enumerate(zip(home, away)):
+        waves[i] = last_wave[h] = last_wave[a] = max(last_wave[h], last_wave[a]) + 1
+    order = np.argsort(waves, kind='stable')
+    bounds = np.flatnonzero(np.diff(waves[order])) + 1
+    for wave in np.split(order, bounds):
+        h, a = home[wave], away[wave]
+        delta = K_FACTOR * (home_scores[wave] - 1 / (1 + 10 ** ((ratings[a] - ratings[h]) / 400)))
+        ratings[h] += delta
+        ratings[a] -= delta
+    return ratings
+
+
+def rebuild_all_ratings():
+    """Recomputes the rating of every team from the whole history of finished matches. Returns the matches rated."""
+    participations = TeamParticipationMatch.objects.filter(
+        match__status='FT',
+    ).exclude(
+        match__stage__in=EXCLUDED_STAGES,
+    ).values_list('match_id', 'team_id', 'score', 'penalties').order_by('match__datetime', 'match_id', '-is_home')
+
+    pairs = {}
+    for match_id, *side in participations:
+        pairs.setdefault(match_id, []).append(side)
+    results = [(match_id, sides) for match_id, sides in pairs.items() if len(sides) == 2]
+
+    team_ids = list(Team.objects.values_list('id', flat=True))
+    index = {team_id: i for i, team_id in enumerate(team_ids)}
+    home = np.array([index[home_side[0]] for _, (home_side, _) in results], dtype=int)
+    away = np.array([index[away_side[0]] for _, (_, away_side) in results], dtype=int)
+    goals = np.array([[home_side[1], away_side[1]] for _, (home_side, away_side) in results], dtype=float).reshape(-1, 2)
+    penalties = np.array([[home_side[2], away_side[2]] for _, (home_side, away_side) in results], dtype=float).reshape(-1, 2)
+    home_scores = np.select(
+        [goals[:, 0] > goals[:, 1], goals[:, 0] < goals[:, 1], penalties[:, 0] > penalties[:, 1], penalties[:, 0] < penalties[:, 1]],
+        [RESULT_SCORES['REGULAR_WIN'], RESULT_SCORES['REGULAR_LOSS'], RESULT_SCORES['PENALTY_WIN'], RESULT_SCORES['PENALTY_LOSS']],
+        RESULT_SCORES['DRAW'],
+    )
+    ratings = replay_ratings(home, away, home_scores, len(team_ids))
+
+    rated_ids = [match_id for match_id, _ in results]
+    with transaction.atomic():
+        Team.objects.bulk_update(
+            [Team(pk=team_id, rating=float(ratings[i])) for i, team_id in enumerate(team_ids)], ['rating'], batch_size=500,
+        )
+        Match.objects.filter(rated=True).exclude(pk__in=rated_ids).update(rated=False)
+        Match.objects.filter(pk__in=rated_ids).update(rated=True)
+    return len(rated_ids)
@@ -1,5 +1,10 @@
+from copy import copy
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
-from .models import LocalLeague, Match, MatchEvent, News, Player, Stadium, Team, TeamParticipationMatch
+from .models import LocalLeague, Match, MatchEvent, News, Player, QualificationProbability, Stadium, Standing, StandingSnapshot, Suspension, Team, TeamParticipationMatch
+from .team_form import attach_forms
+from .tiebreakers import rank_teams
 
 class ExtraFieldsSerializer(serializers.Serializer):
 
@@ -11,6 +16,14 @@ class ExtraFieldsSerializer(serializers.Serializer):
         else:
             return expanded_fields
 
+class TeamListSerializer(serializers.ListSerializer):
+    """Loads the form of every serialized team at once instead of once per team."""
+
+    def to_representation(self, data):
+        teams = list(data.all() if hasattr(data, 'all') else data)
+        attach_forms(teams)
+        return super().to_representation(teams)
+
 class TeamSerializer(ExtraFieldsSerializer,serializers.ModelSerializer):
     local_league = serializers.SlugRelatedField(
         read_only=False,
@@ -21,7 +34,8 @@ class TeamSerializer(ExtraFieldsSerializer,serializers.ModelSerializer):
     class Meta:
         model = Team
         fields = '__all__'
-        extra_fields = ['players', 'pts', 'record']   
+        extra_fields = ['players', 'pts', 'record', 'form']
+        list_serializer_class = TeamListSerializer
         depth = 1    
 
 class TeamSerializerNoplayers(ExtraFieldsSerializer, serializers.ModelSerializer):
@@ -34,18 +48,50 @@ class TeamSerializerNoplayers(ExtraFieldsSerializer, serializers.ModelSerializer
     class Meta:
         model = Team
         fields = '__all__'
-        extra_fields = ['pts', 'record']
+        extra_fields = ['pts', 'record', 'form']
+        list_serializer_class = TeamListSerializer
         depth = 1
 
+class StandingSerializer(serializers.ModelSerializer):
+    team = serializers.SlugRelatedField(read_only=True, slug_field='slug')
+    team_name = serializers.ReadOnlyField(source='team.name')
+
+    class Meta:
+        model = Standing
+        fields = [
+            'team', 'team_name', 'stage', 'played', 'points', 'regular_wins', 'penalty_wins',
+            'penalty_losses', 'regular_losses', 'draws', 'goals_for', 'goals_against', 'goal_difference', 'record',
+        ]
+
+class StandingSnapshotSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = StandingSnapshot
+        fields = ['date', 'stage', 'table']
+
+class QualificationProbabilitySerializer(serializers.ModelSerializer):
+    team = serializers.SlugRelatedField(read_only=True, slug_field='slug')
+
+    class Meta:
+        model = QualificationProbability
+        fields = ['team', 'qualification', 'positions', 'trials', 'updated_at']
+
 class LocalLeagueSerializer(ExtraFieldsSerializer, serializers.ModelSerializer):
-    teams = TeamSerializerNoplayers(many=True, read_only=True)
+    teams = serializers.SerializerMethodField()
+    standings = StandingSerializer(many=True, read_only=True)
+    qualification_probabilities = QualificationProbabilitySerializer(many=True, read_only=True)
     
     class Meta:
         model = LocalLeague
         fields = '__all__'
-        extra_fields = ['teams', 'stadiums', 'staff', 'partners']
+        extra_fields = ['teams', 'stadiums', 'staff', 'partners', 'standings', 'qualification_probabilities']
         depth = 1
 
+    def get_teams(self, obj):
+        # teams in standings order, ties broken by the league tie-breakers
+        teams = rank_teams(obj.teams.all(), obj, self.context.get('stage', 'Gironi'))
+        return TeamSerializerNoplayers(teams, many=True, context=self.context).data
+
 
 class PlayerSerializer(serializers.ModelSerializer):
     team = serializers.SlugRelatedField(
@@ -58,6 +104,31 @@ class PlayerSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class SuspensionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Suspension
+        fields = ['id', 'reason', 'match', 'matches', 'starts_after', 'ends_at']
+
+class PlayerEligibilitySerializer(serializers.ModelSerializer):
+    """Roster entry with the disciplinary record of the player and the suspensions covering a given match."""
+    yellow_cards = serializers.SerializerMethodField()
+    red_cards = serializers.SerializerMethodField()
+    eligible = serializers.SerializerMethodField()
+    suspensions = SuspensionSerializer(many=True, read_only=True, source='active_suspensions')
+
+    def get_yellow_cards(self, obj):
+        return sum(r.yellow_cards for r in obj.disciplinary_records.all())
+
+    def get_red_cards(self, obj):
+        return sum(r.red_cards for r in obj.disciplinary_records.all())
+
+    def get_eligible(self, obj):
+        return not obj.active_suspensions
+
+    class Meta:
+        model = Player
+        fields = ['id', 'first_name', 'last_name', 'shirt_number', 'position', 'yellow_cards', 'red_cards', 'eligible', 'suspensions']
+
 class StadiumSerializer(serializers.ModelSerializer):
     local_leagues = serializers.SlugRelatedField(
         read_only=False,
@@ -85,18 +156,43 @@ class MatchEventSerializer(serializers.ModelSerializer):
         model = MatchEvent
         fields = '__all__'
 
+class TeamSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Team
+        fields = ['id', 'slug', 'name', 'short_name', 'logo']
+
 class TeamParticipationMatchSerializer(serializers.ModelSerializer):
     # team = serializers.SlugRelatedField(
     #     read_only=False,
     #     queryset=Team.objects.all(),
     #     slug_field='slug'
     # )
-    team = TeamSerializerNoplayers(read_only=True)
+    team = serializers.SerializerMethodField()
     events = MatchEventSerializer(many=True, read_only=True)
+
+    def get_team(self, obj):
+        # standings (pts, record) are only included when explicitly requested, see MatchViewSet
+        if self.context.get('include_standings'):
+            return TeamSerializerNoplayers(obj.team, context=self.context).data
+        return TeamSummarySerializer(obj.team, context=self.context).data
+
     class Meta:
         model = TeamParticipationMatch
         fields = ['id', 'is_home', 'penalties', 'score', 'team', 'events']
 
+def attach_match_forms(matches):
+    """Loads the form of the teams of the given matches (participations prefetched) with one cache lookup."""
+    attach_forms([p.team for match in matches for p in match.participations.all()])
+
+class MatchListSerializer(serializers.ListSerializer):
+    """With ?include=standings, loads the form of every team in the page at once instead of once per team."""
+
+    def to_representation(self, data):
+        matches = list(data.all() if hasattr(data, 'all') else data)
+        if self.context.get('include_standings'):
+            attach_match_forms(matches)
+        return super().to_representation(matches)
+
 class MatchSerializer(serializers.ModelSerializer):
     # team_scores = serializers.SerializerMethodField()
     # def get_team_scores(self, obj):
@@ -109,6 +205,23 @@ class MatchSerializer(serializers.ModelSerializer):
         model = Match
         fields = ['id', 'datetime', 'stadium', 'score_text', 'name', 'finished', 'teams', 'status', 'isLive', 'stage']
         depth=1
+        list_serializer_class = MatchListSerializer
+
+    def to_representation(self, instance):
+        if self.parent is None and self.context.get('include_standings'):
+            attach_match_forms([instance])
+        return super().to_representation(instance)
+
+    def validate(self, attrs):
+        # rescheduling must not double-book the stadium, see Match.clean
+        match = copy(self.instance) if self.instance else Match()
+        for field, value in attrs.items():
+            setattr(match, field, value)
+        try:
+            match.clean()
+        except DjangoValidationError as e:
+            raise serializers.ValidationError(e.message_dict)
+        return attrs
 
 class NewsSerializer(serializers.ModelSerializer):
     local_league = serializers.SlugRelatedField(
@@ -0,0 +1,248 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import bump_versions
+from .discipline import refresh_discipline, refresh_match_discipline, refresh_suspension_windows
+from .models import LocalLeague, Match, MatchEvent, Player, Stadium, StandingSnapshot, Team, TeamParticipationMatch
+from .ratings import schedule_rating, schedule_replay
+from .standings import refresh_match_snapshots, refresh_match_standings, refresh_snapshots
+
+# Stored participation scores are refreshed on every event change, while
+# only finished matches count towards the standings and their matchday
+# snapshots, so changes to scheduled or live matches do not trigger any
+# standings recomputation.
+# Disciplinary records follow the card events, and suspension windows
+# follow the schedule of the suspended players' teams.
+# Team ratings are updated once, when a match is first seen finished with
+# both its teams, and the whole history is replayed when the result of a
+# rated match changes. Both run when the transaction commits, after the
+# inlines saved with the match.
+# Cached results depending on a match (including the calendar feeds of its
+# league, teams and stadium) are invalidated on every change.
+# Bulk changes (see matches.fixtures) mute the handlers and refresh what
+# they touched once at the end instead.
+
+_state = threading.local()
+
+
+@contextmanager
+def muted_signals():
+    """Skips the handlers below within the block, whose caller refreshes the derived data itself."""
+    previous = getattr(_state, 'muted', False)
+    _state.muted = True
+    try:
+        yield
+    finally:
+        _state.muted = previous
+
+
+def signals_muted():
+    return getattr(_state, 'muted', False)
+
+
+def refresh_rating(match_id, rated):
+    """Rates a newly finished match, or replays the ratings after the result of a rated match changed."""
+    if rated:
+        schedule_replay()
+    else:
+        schedule_rating(match_id)
+
+
+def invalidate_match(match_id, extra_team_ids=(), previous_stage=None, extra_stadium_ids=()):
+    """
+    Invalidates the cached results depending on the given match, its teams, their local leagues and its stadium,
+    and the knockout brackets of those leagues when the match is (or was) a knockout match.
+    """
+    teams = Team.objects.filter(
+        Q(match_participations__match_id=match_id) | Q(pk__in=[t for t in extra_team_ids if t is not None])
+    ).values_list('id', 'local_league_id').distinct()
+    team_ids = {team_id for team_id, _ in teams}
+    league_ids = {league_id for _, league_id in teams}
+    bump_versions('match', [match_id])
+    bump_versions('team', team_ids)
+    bump_versions('league', league_ids)
+    stage, stadium_id = Match.objects.filter(pk=match_id).values_list('stage', 'stadium_id').first() or (None, None)
+    bump_versions('stadium', [stadium_id, *extra_stadium_ids])
+    if stage in Match.KNOCKOUT_STAGES or previous_stage in Match.KNOCKOUT_STAGES:
+        bump_versions('knockout', league_ids)
+
+
+@receiver(pre_save, sender=Match)
+def match_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_values = None
+    if raw or instance.pk is None or signals_muted():
+        return
+    instance._previous_values = Match.objects.filter(pk=instance.pk).values(
+        'status', 'stage', 'score_computation_mode', 'datetime', 'stadium_id', 'rated',
+    ).first()
+    if instance._previous_values:
+        # rated is only written by matches.ratings: keep the stored flag over the one of a stale instance
+        instance.rated = instance._previous_values['rated']
+
+
+@receiver(post_save, sender=Match)
+def match_saved(sender, instance, created, raw=False, **kwargs):
+    if raw or created or signals_muted():
+        return
+    previous = getattr(instance, '_previous_values', None) or {}
+    if previous.get('score_computation_mode') != instance.score_computation_mode:
+        instance.participations.all().refresh_scores()
+    if instance.finished or previous.get('status') == 'FT':
+        refresh_match_standings(instance.id)
+        refresh_match_snapshots(instance.id, previous=previous)
+    if instance.rated:
+        rating_fields = ['status', 'stage', 'score_computation_mode', 'datetime']
+        if any(previous.get(field) != getattr(instance, field) for field in rating_fields):
+            schedule_replay()
+    elif instance.finished:
+        schedule_rating(instance.id)
+    if previous.get('datetime') != instance.datetime or previous.get('stage') != instance.stage:
+        refresh_match_discipline(instance.id)
+        refresh_suspension_windows(instance.participations.values_list('team_id', flat=True))
+    invalidate_match(instance.id, previous_stage=previous.get('stage'), extra_stadium_ids=[previous.get('stadium_id')])
+
+
+@receiver(post_delete, sender=Match)
+def match_deleted(sender, instance, **kwargs):
+    if signals_muted():
+        return
+    if instance.rated:
+        schedule_replay()
+    bump_versions('match', [instance.id])
+
+
+@receiver(pre_save, sender=TeamParticipationMatch)
+def participation_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_team_id = None
+    if raw or instance.pk is None or signals_muted():
+        return
+    instance._previous_team_id = TeamParticipationMatch.objects.filter(pk=instance.pk).values_list('team_id', flat=True).first()
+
+
+@receiver(post_save, sender=TeamParticipationMatch)
+def participation_saved(sender, instance, raw=False, **kwargs):
+    if raw or signals_muted():
+        return
+    previous_team_id = getattr(instance, '_previous_team_id', None)
+    if instance.match.finished:
+        refresh_match_standings(instance.match_id, extra_team_ids=[previous_team_id])
+        refresh_match_snapshots(instance.match_id, extra_team_ids=[previous_team_id])
+        refresh_rating(instance.match_id, Match.objects.filter(pk=instance.match_id, rated=True).exists())
+    if previous_team_id != instance.team_id:
+        instance.match.refresh_pair_key()
+        refresh_suspension_windows([instance.team_id, previous_team_id])
+    invalidate_match(instance.match_id, extra_team_ids=[previous_team_id])
+
+
+@receiver(post_delete, sender=TeamParticipationMatch)
+def participation_deleted(sender, instance, **kwargs):
+    if signals_muted():
+        return
+    refresh_match_standings(instance.match_id, extra_team_ids=[instance.team_id])
+    if Match.objects.filter(pk=instance.match_id, status='FT').exists():
+        refresh_match_snapshots(instance.match_id, extra_team_ids=[instance.team_id])
+    if Match.objects.filter(pk=instance.match_id, rated=True).exists():
+        schedule_replay()
+    Match.objects.filter(pk=instance.match_id).update(
+        pair_key=Match.pair_key_for(TeamParticipationMatch.objects.filter(match_id=instance.match_id).values_list('team_id', flat=True))
+    )
+    refresh_suspension_windows([instance.team_id])
+    invalidate_match(instance.match_id, extra_team_ids=[instance.team_id])
+
+
+@receiver(pre_save, sender=MatchEvent)
+def event_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_values = None
+    if raw or instance.pk is None or signals_muted():
+        return
+    instance._previous_values = MatchEvent.objects.filter(pk=instance.pk).values('team_match_id', 'player_id', 'event_type').first()
+
+
+@receiver(post_save, sender=MatchEvent)
+@receiver(post_delete, sender=MatchEvent)
+def event_changed(sender, instance, raw=False, **kwargs):
+    if raw or signals_muted():
+        return
+    previous = getattr(instance, '_previous_values', None) or {}
+    team_match_ids = {instance.team_match_id, previous.get('team_match_id')} - {None}
+    participations = TeamParticipationMatch.objects.filter(pk__in=team_match_ids)
+    participations.refresh_scores()
+    goals = 'GOAL' in (instance.event_type, previous.get('event_type'))
+    for match_id, status, rated in participations.values_list('match_id', 'match__status', 'match__rated').distinct():
+        if status == 'FT':
+            refresh_match_standings(match_id)
+            refresh_match_snapshots(match_id)
+            if goals:
+                refresh_rating(match_id, rated)
+        invalidate_match(match_id)
+    cards = ('YELLOW_CARD', 'RED_CARD')
+    if instance.event_type in cards or previous.get('event_type') in cards:
+        refresh_discipline([instance.player_id, previous.get('player_id')])
+
+
+@receiver(post_save, sender=Player)
+@receiver(post_delete, sender=Player)
+def player_changed(sender, instance, raw=False, **kwargs):
+    # player names and teams are part of the cached leaderboards and match timelines
+    if raw or signals_muted():
+        return
+    league_id = Team.objects.filter(pk=instance.team_id).values_list('local_league_id', flat=True).first()
+    bump_versions('match', MatchEvent.objects.filter(player_id=instance.pk).values_list('team_match__match_id', flat=True).distinct())
+    bump_versions('team', [instance.team_id])
+    bump_versions('league', [league_id])
+
+
+@receiver(post_save, sender=Team)
+def team_changed(sender, instance, raw=False, **kwargs):
+    # team names are part of the knockout bracket and of the calendar feeds of the team, of its opponents and of the stadiums it plays in
+    if raw or signals_muted():
+        return
+    bump_versions('team', [instance.id])
+    bump_versions('team', Team.objects.filter(match_participations__match__participations__team=instance).values_list('id', flat=True).distinct())
+    bump_versions('league', [instance.local_league_id])
+    bump_versions('knockout', [instance.local_league_id])
+    bump_versions('stadium', Match.objects.filter(participations__team=instance).values_list('stadium_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Stadium)
+def stadium_changed(sender, instance, raw=False, **kwargs):
+    # stadium names and addresses are part of the calendar feeds
+    if raw or signals_muted():
+        return
+    bump_versions('stadium', [instance.id])
+    bump_versions('league', instance.local_leagues.values_list('id', flat=True))
+    bump_versions('team', Team.objects.filter(match_participations__match__stadium=instance).values_list('id', flat=True).distinct())
+
+
+@receiver(pre_save, sender=LocalLeague)
+def local_league_pre_save(sender, instance, raw=False, **kwargs):
+    instance._previous_values = None
+    if raw or instance.pk is None or signals_muted():
+        return
+    instance._previous_values = LocalLeague.objects.filter(pk=instance.pk).values(
+        'yellow_cards_threshold', 'yellow_cards_suspension', 'red_card_suspension', 'tiebreakers'
+    ).first()
+
+
+@receiver(post_save, sender=LocalLeague)
+def local_league_saved(sender, instance, created, raw=False, **kwargs):
+    previous = getattr(instance, '_previous_values', None)
+    if raw or created or previous is None or signals_muted():
+        return
+    current = {field: getattr(instance, field) for field in previous}
+    if current['tiebreakers'] != previous['tiebreakers']:
+        # the snapshots are ranked by the tie-breakers too
+        for stage in StandingSnapshot.objects.filter(local_league=instance).values_list('stage', flat=True).distinct():
+            refresh_snapshots(instance.id, stage)
+        bump_versions('league', [instance.id])
+    discipline_fields = ['yellow_cards_threshold', 'yellow_cards_suspension', 'red_card_suspension']
+    if any(current[field] != previous[field] for field in discipline_fields):
+        # the suspension rules changed
+        refresh_discipline(MatchEvent.objects.filter(
+            team_match__team__local_league=instance,
+            event_type__in=['YELLOW_CARD', 'RED_CARD'],
+        ).values_list('player_id', flat=True).distinct())
@@ -0,0 +1,71 @@
+"""
+NumPy Monte Carlo sampling of the remaining group stage matches.
+This module does not import Django, so that the trials can run in worker processes.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Chunk of trials sampled at once, bounding the memory used by the (trials, matches) arrays.
+CHUNK_TRIALS = 10000
+
+
+def simulate_counts(inputs, trials, seed):
+    """
+    Plays the remaining fixtures trials times and ranks the final tables.
+    Each side scores Poisson distributed goals; tied matches go to penalties, won by either side with equal chance.
+    Tables are ranked by points, goal difference and goals scored, remaining ties being broken at random.
+    Returns a (teams, positions) array counting how many times each team finished in each position.
+    """
+    rng = np.random.default_rng(seed)
+    home, away = inputs['fixtures'].T
+    points_by_result = inputs['points_by_result']
+    teams, fixtures = len(inputs['points']), len(home)
+
+    # incidence matrices mapping the fixture results to the teams
+    home_incidence = np.zeros((fixtures, teams))
+    home_incidence[np.arange(fixtures), home] = 1
+    away_incidence = np.zeros((fixtures, teams))
+    away_incidence[np.arange(fixtures), away] = 1
+
+    counts = np.zeros((teams, teams), dtype=np.int64)
+    for start in range(0, trials, CHUNK_TRIALS):
+        size = min(CHUNK_TRIALS, trials - start)
+        home_goals = rng.poisson(inputs['home_rates'], size=(size, fixtures))
+        away_goals = rng.poisson(inputs['away_rates'], size=(size, fixtures))
+        home_penalties = rng.random((size, fixtures)) < 0.5
+        tied = home_goals == away_goals
+        home_points = np.select(
+            [home_goals > away_goals, tied & home_penalties, tied],
+            [points_by_result['REGULAR_WIN'], points_by_result['PENALTY_WIN'], points_by_result['PENALTY_LOSS']],
+            points_by_result['REGULAR_LOSS'],
+        )
+        away_points = np.select(
+            [away_goals > home_goals, tied & ~home_penalties, tied],
+            [points_by_result['REGULAR_WIN'], points_by_result['PENALTY_WIN'], points_by_result['PENALTY_LOSS']],
+            points_by_result['REGULAR_LOSS'],
+        )
+        points = inputs['points'] + home_points @ home_incidence + away_points @ away_incidence
+        goal_difference = inputs['goal_difference'] + (home_goals - away_goals) @ (home_incidence - away_incidence)
+        goals_for = inputs['goals_for'] + home_goals @ home_incidence + away_goals @ away_incidence
+
+        # single sort key: points, then goal difference, then goals scored, then a random fraction
+        key = (points * 1000 + np.clip(goal_difference + 500, 0, 999)) * 1000 + np.clip(goals_for, 0, 999) + rng.random((size, teams))
+        order = np.argsort(-key, axis=1)
+        for position in range(teams):
+            counts[:, position] += np.bincount(order[:, position], minlength=teams)
+    return counts
+
+
+def run_trials(inputs, trials, workers=1, seed=None):
+    """
+    Runs the given number of trials, split across a pool of worker processes when workers > 1.
+    Returns the position counts summed over every trial (see simulate_counts).
+    """
+    chunks = max(1, workers)
+    sizes = [trials // chunks + (1 if i < trials % chunks else 0) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(chunks)
+    if workers <= 1:
+        return simulate_counts(inputs, trials, seeds[0])
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(simulate_counts, [inputs] * chunks, sizes, seeds))
@@ -0,0 +1,167 @@
+from django.db import transaction
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import LocalLeague, Match, Standing, StandingSnapshot, Team, TeamParticipationMatch
+from .tiebreakers import order_rows
+
+SNAPSHOT_FIELDS = [
+    'played', 'points', 'regular_wins', 'penalty_wins', 'penalty_losses', 'regular_losses', 'draws',
+    'goals_for', 'goals_against', 'goal_difference',
+]
+
+
+def compute_standings(team_ids):
+    """
+    Computes the standings rows of the given teams from their finished matches.
+    Returns a dict keyed by (team_id, stage) with the unsaved Standing instances.
+    """
+    participations = TeamParticipationMatch.objects.filter(
+        team_id__in=team_ids,
+        match__status='FT',
+    ).select_related('team').with_opponents()
+
+    rows = {}
+    for p in participations:
+        opponent = p.opponent_participation
+        result = p.result_against(opponent)
+        if result is None:
+            continue
+        key = (p.team_id, p.match.stage)
+        row = rows.get(key)
+        if row is None:
+            row = rows[key] = Standing(local_league_id=p.team.local_league_id, team_id=p.team_id, stage=p.match.stage)
+        row.played += 1
+        row.points += TeamParticipationMatch.POINTS_BY_RESULT.get(result, 0)
+        if result == 'REGULAR_WIN':
+            row.regular_wins += 1
+        elif result == 'PENALTY_WIN':
+            row.penalty_wins += 1
+        elif result == 'PENALTY_LOSS':
+            row.penalty_losses += 1
+        elif result == 'REGULAR_LOSS':
+            row.regular_losses += 1
+        else:
+            row.draws += 1
+        row.goals_for += max(p.score, 0)
+        row.goals_against += max(opponent.score, 0)
+        row.goal_difference = row.goals_for - row.goals_against
+    return rows
+
+
+def refresh_standings(team_ids):
+    """Recomputes and replaces the persisted standings rows of the given teams."""
+    team_ids = set(team_ids)
+    if not team_ids:
+        return
+    rows = compute_standings(team_ids)
+    with transaction.atomic():
+        Standing.objects.filter(team_id__in=team_ids).delete()
+        Standing.objects.bulk_create(rows.values())
+
+
+def refresh_match_standings(match_id, extra_team_ids=()):
+    """Recomputes the standings rows of the teams taking part in the given match."""
+    team_ids = set(TeamParticipationMatch.objects.filter(match_id=match_id).values_list('team_id', flat=True))
+    refresh_standings(team_ids | {t for t in extra_team_ids if t is not None})
+
+
+def rebuild_all_standings():
+    """Recomputes the standings rows of every team. Returns the number of rows written."""
+    team_ids = list(Team.objects.values_list('id', flat=True))
+    rows = compute_standings(team_ids)
+    with transaction.atomic():
+        Standing.objects.all().delete()
+        Standing.objects.bulk_create(rows.values())
+    return len(rows)
+
+
+def compute_snapshot_table(local_league, stage, date):
+    """
+    Standings table of a local league stage counting the matches played up to the given date,
+    ranked by the league tie-breakers like the live table (see matches.tiebreakers).
+    """
+    teams = Team.objects.filter(local_league=local_league).with_standings(stage, until=date).values('id', 'slug', 'name', *SNAPSHOT_FIELDS)
+    rows = {row['id']: row for row in teams}
+    return [
+        {'position': position, 'team': rows[team_id]['slug'], **{field: rows[team_id][field] for field in SNAPSHOT_FIELDS}}
+        for position, team_id in enumerate(order_rows(rows, local_league, stage, until=date), start=1)
+    ]
+
+
+def refresh_snapshots(local_league_id, stage, since=None):
+    """
+    Recomputes the standings snapshots of a local league stage for every matchday from the given date on
+    (every matchday when since is None), dropping the snapshots of days left without finished matches.
+    """
+    matches = Match.objects.filter(status='FT', stage=stage, participations__team__local_league_id=local_league_id)
+    if since is not None:
+        matches = matches.filter(datetime__date__gte=since)
+    dates = sorted(set(matches.annotate(day=TruncDate('datetime')).values_list('day', flat=True)))
+    local_league = LocalLeague.objects.get(pk=local_league_id)
+    snapshots = [
+        StandingSnapshot(local_league_id=local_league_id, stage=stage, date=date, table=compute_snapshot_table(local_league, stage, date))
+        for date in dates
+    ]
+    stale = StandingSnapshot.objects.filter(local_league_id=local_league_id, stage=stage)
+    if since is not None:
+        stale = stale.filter(date__gte=since)
+    with transaction.atomic():
+        stale.delete()
+        StandingSnapshot.objects.bulk_create(snapshots)
+    return len(snapshots)
+
+
+def refresh_match_snapshots(match_id, extra_team_ids=(), previous=None):
+    """
+    Recomputes the snapshots affected by a change to a finished match, from its matchday on.
+    previous may hold the former datetime and stage of the match when they changed.
+    """
+    match = Match.objects.filter(pk=match_id).first()
+    previous = previous or {}
+    team_ids = set(TeamParticipationMatch.objects.filter(match_id=match_id).values_list('team_id', flat=True))
+    team_ids |= {t for t in extra_team_ids if t is not None}
+    league_ids = set(Team.objects.filter(pk__in=team_ids).values_list('local_league_id', flat=True))
+    stages = {previous.get('stage'), match.stage if match else None} - {None}
+    datetimes = [d for d in (previous.get('datetime'), match.datetime if match else None) if d is not None]
+    since = min(timezone.localdate(d) for d in datetimes) if datetimes else None
+    for local_league_id in league_ids:
+        for stage in stages:
+            refresh_snapshots(local_league_id, stage, since)
+
+
+def rebuild_all_snapshots():
+    """Recomputes every standings snapshot. Returns the number of snapshots written."""
+    pairs = Match.objects.filter(status='FT').values_list('participations__team__local_league_id', 'stage').distinct()
+    with transaction.atomic():
+        StandingSnapshot.objects.all().delete()
+        return sum(refresh_snapshots(local_league_id, stage) for local_league_id, stage in set(pairs) if local_league_id is not None)
+
+
+def head_to_head(team_id, matches):
+    """
+    Aggregates the results of a team in the given matches against a single opponent.
+    The matches must have their participations prefetched (see Match.home_and_away).
+    """
+    summary = {
+        'played': 0, 'regular_wins': 0, 'penalty_wins': 0, 'penalty_losses': 0, 'regular_losses': 0, 'draws': 0,
+        'goals_for': 0, 'goals_against': 0,
+    }
+    result_fields = {
+        'REGULAR_WIN': 'regular_wins',
+        'PENALTY_WIN': 'penalty_wins',
+        'PENALTY_LOSS': 'penalty_losses',
+        'REGULAR_LOSS': 'regular_losses',
+        'DRAW': 'draws',
+    }
+    for match in matches:
+        teams = match.home_and_away()
+        if not match.finished or teams is None:
+            continue
+        mine, theirs = teams if teams[0].team_id == team_id else reversed(teams)
+        summary['played'] += 1
+        summary[result_fields[mine.result_against(theirs)]] += 1
+        summary['goals_for'] += max(mine.score, 0)
+        summary['goals_against'] += max(theirs.score, 0)
+    summary['goal_difference'] = summary['goals_for'] - summary['goals_against']
+    return summary
@@ -0,0 +1,59 @@
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from .cache import cached_many
+from .models import TeamParticipationMatch
+
+DEFAULT_FORM_LENGTH = 5
+MAX_FORM_LENGTH = 20
+
+RESULT_LETTERS = {
+    'REGULAR_WIN': 'W',
+    'PENALTY_WIN': 'PW',
+    'PENALTY_LOSS': 'PL',
+    'REGULAR_LOSS': 'L',
+    'DRAW': 'D',
+}
+
+
+def compute_forms(team_ids, length=DEFAULT_FORM_LENGTH):
+    """
+    Last results of each given team, most recent first, computed with a single windowed query
+    over the finished matches ordered by datetime (plus the prefetch of the opponents).
+    """
+    participations = TeamParticipationMatch.objects.filter(
+        team_id__in=team_ids,
+        match__status='FT',
+    ).annotate(
+        position=Window(RowNumber(), partition_by=F('team_id'), order_by=[F('match__datetime').desc(), F('match_id').desc()]),
+    ).filter(position__lte=length).order_by('team_id', 'position').with_opponents().prefetch_related('match__participations__team')
+
+    forms = {team_id: [] for team_id in team_ids}
+    for p in participations:
+        opponent = p.opponent_participation
+        result = p.result_against(opponent)
+        if result is None:
+            continue
+        forms[p.team_id].append({
+            'match': p.match_id,
+            'datetime': p.match.datetime,
+            'stage': p.match.stage,
+            'opponent': opponent.team.slug,
+            'is_home': p.is_home,
+            'goals_for': p.score,
+            'goals_against': opponent.score,
+            'result': RESULT_LETTERS[result],
+        })
+    return forms
+
+
+def team_forms(team_ids, length=DEFAULT_FORM_LENGTH):
+    """Cached last results of the given teams, invalidated when one of the team's matches changes."""
+    return cached_many('team', team_ids, f"form:{length}", lambda missing: compute_forms(missing, length))
+
+
+def attach_forms(teams, length=DEFAULT_FORM_LENGTH):
+    """Loads the form of the given teams in bulk so that Team.form costs no query."""
+    forms = team_forms([team.id for team in teams], length)
+    for team in teams:
+        team._form = forms[team.id]
@@ -1,3 +1,272 @@
-from django.test import TestCase
+from datetime import date, datetime, time, timedelta
+from io import StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .conflicts import find_conflicts
+from .filters import filter_matches
+from .fixtures import FixtureError, generate_fixtures, round_robin_rounds
+from .ratings import rebuild_all_ratings
+from .standings import compute_standings
+from .tiebreakers import compute_table, league_table
+from .models import LocalLeague, Match, MatchEvent, Stadium, Standing, StandingSnapshot, Team, TeamParticipationMatch
+
+
+class MatchFactoryMixin:
+    def setUp(self):
+        cache.clear()
+        self.league = LocalLeague.objects.create(slug='league', name='League', title='League')
+        self.stadium = Stadium.objects.create(name='Stadium', address='Address')
+        self.stadium.local_leagues.add(self.league)
+
+    def create_team(self):
+        number = Team.objects.count()
+        return Team.objects.create(slug=f'team-{number}', name=f'Team {number}', short_name=f'T{number}', local_league=self.league)
+
+    def create_matches(self, count, pair=None, **fields):
+        """Creates count matches between the given pair of teams, or between two new teams each."""
+        start = timezone.now() + timedelta(days=Match.objects.count() + 1)
+        for i in range(count):
+            match = Match.objects.create(datetime=start + timedelta(days=i), stadium=self.stadium, **fields)
+            home, away = pair or (self.create_team(), self.create_team())
+            TeamParticipationMatch.objects.create(match=match, team=home, is_home=True)
+            TeamParticipationMatch.objects.create(match=match, team=away, is_home=False)
+
+
+# the query counts below are those of the database, not of a database cache backend
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class MatchListQueriesTests(MatchFactoryMixin, TestCase):
+    def assert_constant_queries(self, url):
+        self.create_matches(2)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.create_matches(6)
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()), 8)
+
+    def test_match_list_queries_do_not_grow_with_the_matches(self):
+        self.assert_constant_queries('/matches/')
+
+    def test_match_list_with_standings_queries_do_not_grow_with_the_matches(self):
+        self.assert_constant_queries('/matches/?include=standings')
+
+    def test_head_to_head_queries_do_not_grow_with_the_matches(self):
+        pair = (self.create_team(), self.create_team())
+        url = f'/teams/{pair[0].slug}/head-to-head/{pair[1].slug}/'
+        self.create_matches(2, pair=pair)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.create_matches(6, pair=pair)
+        cache.clear()
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()['matches']), 8)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class FixtureGenerationTests(MatchFactoryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.teams = [self.create_team() for _ in range(6)]
+
+    def league_matches(self, league=None):
+        return filter_matches(Match.objects.all(), local_league=league or self.league)
+
+    def test_round_robin_pairs_meet_once(self):
+        rounds = round_robin_rounds(range(7))
+        pairs = [frozenset(pair) for pairs in rounds for pair in pairs]
+        self.assertEqual(len(pairs), 21)
+        self.assertEqual(len(set(pairs)), 21)
+
+    def test_replace_deletes_the_previous_matches(self):
+        generate_fixtures(self.league, date(2030, 1, 7))
+        created = generate_fixtures(self.league, date(2030, 2, 4), replace=True)
+        self.assertEqual(created, 15)
+        self.assertEqual(Match.objects.count(), 15)
+        self.assertFalse(Match.objects.filter(participations__isnull=True).exists())
+        self.assertEqual(TeamParticipationMatch.objects.count(), 30)
+
+    def test_replace_queries_do_not_grow_with_the_matches(self):
+        generate_fixtures(self.league, date(2030, 1, 7))
+        with CaptureQueriesContext(connection) as queries:
+            generate_fixtures(self.league, date(2030, 1, 7), replace=True)
+        self.teams += [self.create_team() for _ in range(4)]
+        with self.assertNumQueries(len(queries)):
+            generate_fixtures(self.league, date(2030, 1, 7), replace=True)
+        self.assertEqual(Match.objects.count(), 45)
+
+    def test_slot_must_be_positive(self):
+        for slot in (0, -30):
+            with self.assertRaises(FixtureError):
+                generate_fixtures(self.league, date(2030, 1, 7), slot=slot)
+            with self.assertRaises(CommandError):
+                call_command('generate_fixtures', self.league.slug, start='2030-01-07', slot=slot, stdout=StringIO())
+        self.assertFalse(Match.objects.exists())
+
+    def test_rounds_are_spread_across_days_and_end_by_midnight(self):
+        generate_fixtures(self.league, date(2030, 1, 7), interval=3)
+        kickoffs = [timezone.localtime(m.datetime) for m in self.league_matches()]
+        first_round = [kickoff for kickoff in kickoffs if kickoff.date() < date(2030, 1, 10)]
+        self.assertEqual(len(first_round), 3)
+        self.assertEqual(len({kickoff.date() for kickoff in first_round}), 3)
+        for kickoff in kickoffs:
+            self.assertEqual((kickoff + timedelta(minutes=settings.MATCH_SLOT_MINUTES - 1)).date(), kickoff.date())
+
+    def test_schedule_avoids_other_leagues_bookings(self):
+        other = LocalLeague.objects.create(slug='other', name='Other', title='Other')
+        self.stadium.local_leagues.add(other)
+        other_teams = [
+            Team.objects.create(slug=f'other-{i}', name=f'Other {i}', short_name=f'O{i}', local_league=other)
+            for i in range(2)
+        ]
+        booked = Match.objects.create(datetime=timezone.make_aware(datetime(2030, 1, 7, 20, 0)), stadium=self.stadium)
+        TeamParticipationMatch.objects.create(match=booked, team=other_teams[0], is_home=True)
+        TeamParticipationMatch.objects.create(match=booked, team=other_teams[1], is_home=False)
+        # one stadium, two slots a day: the first round fits in its two days only around the booked slot
+        generate_fixtures(self.league, date(2030, 1, 7), interval=2)
+        self.assertEqual(find_conflicts(Match.objects.all()), [])
+        first_day = [timezone.localtime(m.datetime).time() for m in self.league_matches().filter(datetime__date=date(2030, 1, 7))]
+        self.assertEqual(first_day, [time(21, 30)])
+
+
+class StandingsTests(MatchFactoryMixin, TestCase):
+    def play(self, home, away, home_goals, away_goals, home_offset=0, away_offset=0, **fields):
+        """Creates a finished group match between two teams, with its goal events."""
+        match = Match.objects.create(
+            datetime=timezone.now() - timedelta(days=Match.objects.count() + 1), stadium=self.stadium,
+            stage='Gironi', score_computation_mode='SUM', **fields,
+        )
+        for team, goals, offset, is_home in ((home, home_goals, home_offset, True), (away, away_goals, away_offset, False)):
+            participation = TeamParticipationMatch.objects.create(match=match, team=team, is_home=is_home, score_offset=offset)
+            for _ in range(goals):
+                MatchEvent.objects.create(team_match=participation, event_type='GOAL')
+        match.status = 'FT'
+        match.save()
+        return match
+
+    def test_sql_standings_match_the_stored_standings_with_negative_scores(self):
+        teams = [self.create_team() for _ in range(3)]
+        self.play(teams[0], teams[1], 0, 2, home_offset=-1)
+        self.play(teams[1], teams[2], 1, 1, away_offset=-3)
+        self.play(teams[2], teams[0], 2, 0)
+        stored = compute_standings([team.id for team in teams])
+        fields = ['played', 'points', 'regular_wins', 'regular_losses', 'goals_for', 'goals_against', 'goal_difference']
+        for team in Team.objects.filter(pk__in=[team.id for team in teams]).with_standings('Gironi'):
+            row = stored[(team.id, 'Gironi')]
+            self.assertEqual({field: getattr(team, field) for field in fields}, {field: getattr(row, field) for field in fields})
+
+    def test_snapshots_are_ranked_by_the_league_tiebreakers(self):
+        first, second, third = [self.create_team() for _ in range(3)]
+        self.play(second, third, 5, 0)
+        self.play(first, second, 1, 0)
+        self.league.tiebreakers = ['head_to_head_points', 'goal_difference']
+        self.league.save()
+        snapshot = StandingSnapshot.objects.filter(local_league=self.league, stage='Gironi').latest('date')
+        table = [row['team'] for row in snapshot.table]
+        self.assertEqual(table, [first.slug, second.slug, third.slug])
+        slugs = {team.id: team.slug for team in (first, second, third)}
+        self.assertEqual(table, [slugs[team_id] for team_id in compute_table(self.league)])
+
+    def test_recompute_scores_refreshes_snapshots_ratings_and_cached_tables(self):
+        home, away = self.create_team(), self.create_team()
+        match = self.play(home, away, 1, 0)
+        self.assertEqual(league_table(self.league), [home.id, away.id])
+        # goals added outside the signal handlers
+        participation = match.participations.get(team=away)
+        MatchEvent.objects.bulk_create([MatchEvent(team_match=participation, event_type='GOAL') for _ in range(2)])
+        call_command('recompute_scores', stdout=StringIO())
+        self.assertEqual(Standing.objects.get(team=away).regular_wins, 1)
+        snapshot = StandingSnapshot.objects.get(local_league=self.league, stage='Gironi')
+        self.assertEqual([row['team'] for row in snapshot.table], [away.slug, home.slug])
+        self.assertEqual(league_table(self.league), [away.id, home.id])
+        self.assertGreater(Team.objects.get(pk=away.pk).rating, 1500)
+
+
+class RatingTests(MatchFactoryMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.home, self.away, self.third = [self.create_team() for _ in range(3)]
+
+    def enter_result(self, home, away, home_goals, away_goals, days_ago):
+        """Creates a finished match, then its participations, then their goals in one transaction, as the admin form does."""
+        with self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            match = Match.objects.create(
+                datetime=timezone.now() - timedelta(days=days_ago), stadium=self.stadium, stage='Gironi', status='FT',
+            )
+            participations = [
+                TeamParticipationMatch.objects.create(match=match, team=home, is_home=True),
+                TeamParticipationMatch.objects.create(match=match, team=away, is_home=False),
+            ]
+            for participation, goals in zip(participations, (home_goals, away_goals)):
+                for _ in range(goals):
+                    MatchEvent.objects.create(team_match=participation, event_type='GOAL')
+        return match
+
+    def ratings(self):
+        return dict(Team.objects.values_list('id', 'rating'))
+
+    def assert_ratings_are_rebuilt(self):
+        incremental = self.ratings()
+        rebuild_all_ratings()
+        for team_id, rating in self.ratings().items():
+            self.assertAlmostEqual(incremental[team_id], rating)
+
+    def test_result_entered_with_its_goals_is_rated(self):
+        self.enter_result(self.home, self.away, 2, 0, days_ago=2)
+        self.assertGreater(Team.objects.get(pk=self.home.pk).rating, 1500)
+        self.assert_ratings_are_rebuilt()
+
+    def test_corrected_goal_replays_the_ratings(self):
+        match = self.enter_result(self.home, self.away, 2, 0, days_ago=2)
+        self.enter_result(self.away, self.third, 1, 0, days_ago=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            MatchEvent.objects.filter(team_match__match=match).first().delete()
+            MatchEvent.objects.create(team_match=match.participations.get(is_home=False), event_type='GOAL')
+            MatchEvent.objects.create(team_match=match.participations.get(is_home=False), event_type='GOAL')
+        self.assertLess(Team.objects.get(pk=self.home.pk).rating, 1500)
+        self.assert_ratings_are_rebuilt()
+
+    def test_penalties_set_after_the_match_replay_the_ratings(self):
+        match = self.enter_result(self.home, self.away, 1, 1, days_ago=1)
+        participation = match.participations.get(is_home=False)
+        participation.penalties = 4
+        with self.captureOnCommitCallbacks(execute=True):
+            participation.save(update_fields=['penalties'])
+        self.assertGreater(Team.objects.get(pk=self.away.pk).rating, 1500)
+        self.assert_ratings_are_rebuilt()
+
+
+class CalendarFeedTests(MatchFactoryMixin, TestCase):
+    def test_renaming_a_team_changes_the_stadium_and_opponent_feeds(self):
+        home, away = self.create_team(), self.create_team()
+        self.create_matches(1, pair=(home, away))
+        urls = [f'/stadiums/{self.stadium.id}/calendar.ics', f'/teams/{away.slug}/calendar.ics']
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        home.name = 'Renamed'
+        home.save()
+        for url, etag in zip(urls, etags):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('Renamed', response.content.decode())
+
+
+class BracketTests(MatchFactoryMixin, TestCase):
+    def test_renaming_a_team_refreshes_the_cached_bracket(self):
+        home, away = self.create_team(), self.create_team()
+        self.create_matches(1, pair=(home, away), stage='Quarti')
+        url = f'/local-leagues/{self.league.slug}/bracket/'
+        self.assertNotIn('Renamed', self.client.get(url).content.decode())
+        home.name = 'Renamed'
+        home.save()
+        self.assertIn('Renamed', self.client.get(url).content.decode())
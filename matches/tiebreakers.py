@@ -0,0 +1,148 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Count, Q
+
+from .cache import cached
+from .filters import day_start
+from .models import MatchEvent, Team, TeamParticipationMatch
+
+# Disciplinary points of the fair play rule.
+FAIR_PLAY_POINTS = {'YELLOW_CARD': 1, 'RED_CARD': 3}
+
+
+def result_matrix(local_league_id, stage, until=None):
+    """
+    Pairwise results of the finished matches of a league stage (played up to the date until), computed from a single query.
+    Returns a dict keyed by (team_id, opponent_id) with the points, goals_for and goals_against of the team.
+    """
+    participations = TeamParticipationMatch.objects.filter(
+        match__status='FT',
+        match__stage=stage,
+        team__local_league_id=local_league_id,
+    )
+    if until is not None:
+        participations = participations.filter(match__datetime__lt=day_start(until + timedelta(days=1)))
+    participations = participations.values_list('match_id', 'team_id', 'score', 'penalties')
+    sides = defaultdict(list)
+    for match_id, team_id, score, penalties in participations:
+        sides[match_id].append(TeamParticipationMatch(team_id=team_id, score=score, penalties=penalties))
+
+    matrix = defaultdict(lambda: {'points': 0, 'goals_for': 0, 'goals_against': 0})
+    for pair in sides.values():
+        if len(pair) != 2:
+            continue
+        for mine, theirs in (pair, pair[::-1]):
+            cell = matrix[(mine.team_id, theirs.team_id)]
+            cell['points'] += TeamParticipationMatch.POINTS_BY_RESULT.get(mine.result_against(theirs), 0)
+            cell['goals_for'] += max(mine.score, 0)
+            cell['goals_against'] += max(theirs.score, 0)
+    return matrix
+
+
+def fair_play_points(local_league_id, stage, until=None):
+    """
+    Disciplinary points of each team of a league stage (in the matches played up to the date until),
+    from a single grouped query over the card events.
+    """
+    cards = MatchEvent.objects.filter(
+        team_match__team__local_league_id=local_league_id,
+        team_match__match__stage=stage,
+        event_type__in=FAIR_PLAY_POINTS,
+    )
+    if until is not None:
+        cards = cards.filter(team_match__match__datetime__lt=day_start(until + timedelta(days=1)))
+    cards = cards.values('team_match__team_id').annotate(
+        yellow=Count('id', filter=Q(event_type='YELLOW_CARD')),
+        red=Count('id', filter=Q(event_type='RED_CARD')),
+    )
+    return {
+        row['team_match__team_id']: row['yellow'] * FAIR_PLAY_POINTS['YELLOW_CARD'] + row['red'] * FAIR_PLAY_POINTS['RED_CARD']
+        for row in cards
+    }
+
+
+def rule_keys(rule, group, rows, matrix, fair_play):
+    """Sort key of each team of a tied group for the given rule (higher is better)."""
+    if rule.startswith('head_to_head_'):
+        keys = {}
+        for team_id in group:
+            cells = [matrix[(team_id, other)] for other in group if other != team_id and (team_id, other) in matrix]
+            points = sum(cell['points'] for cell in cells)
+            goals_for = sum(cell['goals_for'] for cell in cells)
+            goals_against = sum(cell['goals_against'] for cell in cells)
+            keys[team_id] = {
+                'head_to_head_points': points,
+                'head_to_head_goal_difference': goals_for - goals_against,
+                'head_to_head_goals_for': goals_for,
+            }[rule]
+        return keys
+    if rule == 'fair_play':
+        return {team_id: -fair_play.get(team_id, 0) for team_id in group}
+    return {team_id: rows[team_id][rule] for team_id in group}
+
+
+def split(group, keys):
+    """Splits a group of teams into the subgroups sharing the same key, best key first."""
+    subgroups = defaultdict(list)
+    for team_id in group:
+        subgroups[keys[team_id]].append(team_id)
+    return [subgroups[key] for key in sorted(subgroups, reverse=True)]
+
+
+def resolve(group, rules, rows, matrix, fair_play):
+    """
+    Orders a group of teams level on points by applying the rules in order.
+    When a rule splits the group, each subgroup still tied starts over from the first rule,
+    so head-to-head rules are evaluated on the mini-league of the teams still level.
+    """
+    for position, rule in enumerate(rules):
+        subgroups = split(group, rule_keys(rule, group, rows, matrix, fair_play))
+        if len(subgroups) == 1:
+            continue
+        ordered = []
+        for subgroup in subgroups:
+            if len(subgroup) == 1:
+                ordered += subgroup
+            else:
+                ordered += resolve(subgroup, rules, rows, matrix, fair_play)
+        return ordered
+    return sorted(group, key=lambda team_id: rows[team_id]['name'])
+
+
+def order_rows(rows, local_league, stage='Gironi', until=None):
+    """
+    Team ids of the given standings rows of a local league stage (keyed by team id, with the name, points,
+    goal_difference and goals_for of the team) in standings order: points first, then the league tie-breakers.
+    With until (a date) the tie-breakers only count the matches played up to that day, like the rows should.
+    Needs up to two queries: the pairwise result matrix and the card counts.
+    """
+    rules = local_league.tiebreakers or []
+    matrix = result_matrix(local_league.id, stage, until) if any(r.startswith('head_to_head_') for r in rules) else {}
+    fair_play = fair_play_points(local_league.id, stage, until) if 'fair_play' in rules else {}
+    ordered = []
+    for group in split(list(rows), {team_id: row['points'] for team_id, row in rows.items()}):
+        ordered += resolve(group, rules, rows, matrix, fair_play) if len(group) > 1 else group
+    return ordered
+
+
+def compute_table(local_league, stage='Gironi'):
+    """
+    Team ids of a local league in standings order: points first, then the league tie-breakers.
+    Needs three queries: the standings, the pairwise result matrix and the card counts.
+    """
+    teams = Team.objects.filter(local_league=local_league).with_standings(stage).values(
+        'id', 'name', 'points', 'goal_difference', 'goals_for',
+    )
+    return order_rows({row['id']: row for row in teams}, local_league, stage)
+
+
+def league_table(local_league, stage='Gironi'):
+    """Cached standings order of a local league stage, invalidated with the league scope."""
+    return cached('league', local_league.id, f"table:{stage}", lambda: compute_table(local_league, stage))
+
+
+def rank_teams(teams, local_league, stage='Gironi'):
+    """Sorts the given teams of a local league by their standings position."""
+    positions = {team_id: position for position, team_id in enumerate(league_table(local_league, stage), start=1)}
+    return sorted(teams, key=lambda team: positions.get(team.id, len(positions) + 1))
@@ -0,0 +1,68 @@
+from django.db.models import F
+
+from .cache import cached
+from .models import TeamParticipationMatch
+
+
+def compute_timeline(match_id):
+    """
+    Events of both teams of a match merged by minute, each with the running score after it.
+    A single query joins the participations to their events, already sorted by minute (events without
+    a minute last); the running score is then accumulated in one pass.
+    The score computation mode of the match is honoured: with SUM the offsets are the starting score,
+    with OFFSET the score is the offset alone and goal events do not change it.
+    Returns None when the match has no participations.
+    """
+    rows = TeamParticipationMatch.objects.filter(match_id=match_id).values(
+        'id', 'is_home', 'score_offset', 'team__slug', 'team__name', 'match__score_computation_mode',
+        'events__id', 'events__minute', 'events__event_type',
+        'events__player_id', 'events__player__first_name', 'events__player__last_name', 'events__player__shirt_number',
+    ).order_by(F('events__minute').asc(nulls_last=True), 'events__id')
+    rows = list(rows)
+    if not rows:
+        return None
+
+    mode = rows[0]['match__score_computation_mode']
+    teams = {}
+    for row in rows:
+        teams[row['id']] = {'side': 'home' if row['is_home'] else 'away', 'slug': row['team__slug'], 'name': row['team__name'], 'offset': row['score_offset']}
+    score = {'home': 0, 'away': 0}
+    if mode in ('SUM', 'OFFSET'):
+        for team in teams.values():
+            score[team['side']] += team['offset']
+    initial_score = dict(score)
+
+    events = []
+    for row in rows:
+        if row['events__id'] is None:
+            continue
+        side = teams[row['id']]['side']
+        if row['events__event_type'] == 'GOAL' and mode != 'OFFSET':
+            score[side] += 1
+        events.append({
+            'id': row['events__id'],
+            'minute': row['events__minute'],
+            'event_type': row['events__event_type'],
+            'team': teams[row['id']]['slug'],
+            'side': side,
+            'player': {
+                'id': row['events__player_id'],
+                'first_name': row['events__player__first_name'],
+                'last_name': row['events__player__last_name'],
+                'shirt_number': row['events__player__shirt_number'],
+            } if row['events__player_id'] else None,
+            'score': dict(score),
+        })
+    return {
+        'match': match_id,
+        'score_computation_mode': mode,
+        'teams': {team['side']: {'slug': team['slug'], 'name': team['name']} for team in teams.values()},
+        'initial_score': initial_score,
+        'events': events,
+        'final_score': score,
+    }
+
+
+def match_timeline(match_id):
+    """Cached timeline of a match, invalidated whenever the match or its events change."""
+    return cached('match', match_id, 'timeline', lambda: compute_timeline(match_id))
@@ -17,4 +17,7 @@ router.register(r'news', NewsViewSet)
 urlpatterns = [
     path('management/matches/', match_list_view, name='custom_match_list'),
     path('management/matches/<int:match_id>/', match_edit_view, name='custom_match_edit'),
+    path('local-leagues/<slug:slug>/calendar.ics', league_calendar, name='league_calendar'),
+    path('teams/<slug:slug>/calendar.ics', team_calendar, name='team_calendar'),
+    path('stadiums/<int:pk>/calendar.ics', stadium_calendar, name='stadium_calendar'),
 ] + router.urls
\ No newline at end of file
@@ -1,12 +1,81 @@
 # from django.shortcuts import render
 from html import entities
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from rest_framework import status, viewsets
-from .models import LocalLeague, Match, MatchEvent, News, Stadium, Team, Player, TeamParticipationMatch
-from .serializer import LocalLeagueSerializer, MatchEventSerializer, MatchSerializer, NewsSerializer, StadiumSerializer, TeamSerializer, PlayerSerializer
+from .models import LocalLeague, Match, MatchEvent, News, QualificationProbability, Stadium, Standing, StandingSnapshot, Suspension, Team, Player
+from .serializer import LocalLeagueSerializer, MatchEventSerializer, MatchSerializer, NewsSerializer, PlayerEligibilitySerializer, StadiumSerializer, StandingSnapshotSerializer, TeamSerializer, PlayerSerializer
+from .analytics import league_analytics
+from .bracket import league_bracket
+from .calendar import feed_body, feed_etag
+from .filters import MatchQueryForm
+from .geo import DEFAULT_RADIUS_KM, MAX_RADIUS_KM, stadiums_nearby
+from .leaderboards import team_leaderboard, top_scorers
+from .live import DEFAULT_UPCOMING, live_matches, upcoming_matches
+from .standings import head_to_head
+from .timeline import match_timeline
+from .team_form import DEFAULT_FORM_LENGTH, MAX_FORM_LENGTH, team_forms
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+from django.utils.dateparse import parse_date
 from django.db.models import Prefetch 
 
+
+def parse_positive_int(value, default=None):
+    """Parses an optional positive integer query parameter, falling back to default when invalid."""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return value if value > 0 else default
+
+
+def scorers_response(request, view, local_league_id=None):
+    """Builds the (optionally paginated with ?limit=&offset=) goal leaders response, see leaderboards.top_scorers."""
+    scorers = top_scorers(
+        local_league_id=local_league_id,
+        stage=request.query_params.get('stage'),
+        top=parse_positive_int(request.query_params.get('top')),
+    )
+    return paginated_response(request, view, scorers)
+
+def parse_location(query_params):
+    """
+    Parses the ?lat=&lon=&radius= (km) query parameters of the nearby searches.
+    Returns None when lat and lon are not given, raises a ValidationError (400) when they are invalid.
+    """
+    if 'lat' not in query_params and 'lon' not in query_params:
+        return None
+    try:
+        lat, lon = float(query_params['lat']), float(query_params['lon'])
+        radius = float(query_params.get('radius', DEFAULT_RADIUS_KM))
+    except (KeyError, ValueError):
+        raise ValidationError({"detail": "lat and lon must both be given as decimal degrees, radius in km."})
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180 and 0 < radius <= MAX_RADIUS_KM):
+        raise ValidationError({"detail": f"lat, lon must be valid coordinates and radius between 0 and {MAX_RADIUS_KM} km."})
+    return lat, lon, radius
+
+def parse_match_filters(query_params):
+    """
+    Parses the ?local-league=&team=&stage=&status=&date=&date-from=&date-to=&stadium= filters of the matches list.
+    Returns the valid MatchQueryForm, raises a ValidationError (400) naming the invalid parameters.
+    """
+    form = MatchQueryForm.from_query_params(query_params)
+    if not form.is_valid():
+        raise ValidationError({MatchQueryForm.QUERY_PARAMS.get(field, 'detail'): errors for field, errors in form.errors.items()})
+    return form
+
+def paginated_response(request, view, rows):
+    """Paginates a list of rows when ?limit= is given, otherwise returns them all."""
+    paginator = LimitOffsetPagination()
+    page = paginator.paginate_queryset(rows, request, view=view)
+    if page is None:
+        return Response(rows)
+    return paginator.get_paginated_response(page)
+
 # # Factories.
 # def handlers_factory(Model, Serializer):
 #     """
@@ -73,45 +142,224 @@ from django.db.models import Prefetch
 
 class LocalLeagueViewSet(viewsets.ModelViewSet):
     queryset = LocalLeague.objects.prefetch_related(
-        "teams",
-        "teams__match_participations",
-        "teams__match_participations__match",
-        "teams__match_participations__events",
+        "stadiums",
+        "staff",
+        "partners",
         Prefetch(
-            'teams__match_participations__match__participations',
-            queryset=TeamParticipationMatch.objects.prefetch_related('events')
-        )
+            'standings',
+            queryset=Standing.objects.select_related('team')
+        ),
+        Prefetch(
+            'qualification_probabilities',
+            queryset=QualificationProbability.objects.select_related('team')
+        ),
     ).all()
     serializer_class = LocalLeagueSerializer
     lookup_field = 'slug'
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        # teams are annotated with their standings in the requested stage, computed by the database,
+        # and sorted by the serializer with the league tie-breakers
+        teams = Team.objects.with_standings(self.stage).prefetch_related('standings')
+        return queryset.prefetch_related(Prefetch('teams', queryset=teams))
+
+    @property
+    def stage(self):
+        return self.request.query_params.get('stage', 'Gironi')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['stage'] = self.stage
+        return context
+
+    @action(detail=True, methods=['get'])
+    def scorers(self, request, slug=None):
+        """Goal leaders of the league. Query params: stage, top (top-N keeping ties), limit/offset."""
+        local_league = get_object_or_404(LocalLeague, slug=slug)
+        return scorers_response(request, self, local_league_id=local_league.id)
+
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, slug=None):
+        """Goals by minute, home advantage and cards per team of the league (?stage= restricts to a stage)."""
+        local_league = get_object_or_404(LocalLeague, slug=slug)
+        return Response(league_analytics(local_league.id, request.query_params.get('stage') or None))
+
+    @action(detail=True, methods=['get'])
+    def bracket(self, request, slug=None):
+        """Knockout bracket of the league, round by round, with the progression between matches."""
+        local_league = get_object_or_404(LocalLeague, slug=slug)
+        return Response(league_bracket(local_league.id))
+
+    @action(detail=True, methods=['get'], url_path='standings-history')
+    def standings_history(self, request, slug=None):
+        """
+        Matchday snapshots of the standings table of a stage (?stage=, default Gironi).
+        With ?date=YYYY-MM-DD only the table as of that date is returned.
+        """
+        local_league = get_object_or_404(LocalLeague, slug=slug)
+        stage = request.query_params.get('stage', 'Gironi')
+        snapshots = StandingSnapshot.objects.filter(local_league=local_league, stage=stage)
+        if 'date' not in request.query_params:
+            return Response(StandingSnapshotSerializer(snapshots, many=True).data)
+        try:
+            date = parse_date(request.query_params['date'])
+        except ValueError:
+            date = None
+        if date is None:
+            return Response({"detail": "The date query parameter must be formatted as YYYY-MM-DD."}, status=status.HTTP_400_BAD_REQUEST)
+        snapshot = snapshots.filter(date__lte=date).order_by('-date').first()
+        if snapshot is None:
+            return Response({'date': None, 'stage': stage, 'table': []})
+        return Response(StandingSnapshotSerializer(snapshot).data)
+
 class TeamViewSet(viewsets.ModelViewSet):
-    queryset = Team.objects.select_related('local_league').all()
+    queryset = Team.objects.select_related('local_league').prefetch_related('standings', 'players').all()
     serializer_class = TeamSerializer
     lookup_field = 'slug'
 
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """
+        Teams of every league by points per game. Query params: stage (default every stage but friendlies),
+        min-played (default 1), top (top-N keeping ties), limit/offset.
+        """
+        teams = team_leaderboard(
+            stage=request.query_params.get('stage') or None,
+            min_played=parse_positive_int(request.query_params.get('min-played'), 1),
+            top=parse_positive_int(request.query_params.get('top')),
+        )
+        return paginated_response(request, self, teams)
+
+    @action(detail=True, methods=['get'])
+    def eligibility(self, request, slug=None):
+        """Disciplinary record and eligibility of every player of the team for the match given with ?match=<id>."""
+        team = get_object_or_404(Team, slug=slug)
+        match_id = parse_positive_int(request.query_params.get('match'))
+        if match_id is None:
+            return Response({"detail": "The match query parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        match = get_object_or_404(Match, pk=match_id)
+        players = team.players.prefetch_related(
+            'disciplinary_records',
+            Prefetch('suspensions', queryset=Suspension.objects.active_for(match), to_attr='active_suspensions'),
+        ).order_by('shirt_number')
+        return Response({
+            'team': team.slug,
+            'match': match.id,
+            'players': PlayerEligibilitySerializer(players, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path=r'head-to-head/(?P<other_slug>[^/.]+)')
+    def head_to_head(self, request, slug=None, other_slug=None):
+        """Aggregate results and list of the matches between two teams, looked up by their pair key."""
+        teams = {t.slug: t for t in Team.objects.filter(slug__in=[slug, other_slug])}
+        if slug not in teams or other_slug not in teams or slug == other_slug:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        team, other = teams[slug], teams[other_slug]
+        matches = Match.objects.filter(
+            pair_key=Match.pair_key_for([team.id, other.id]),
+        ).select_related('stadium').prefetch_related(
+            'stadium__local_leagues', 'participations__team', 'participations__events__player',
+        )
+        return Response({
+            'team': team.slug,
+            'opponent': other.slug,
+            'summary': head_to_head(team.id, matches),
+            'matches': MatchSerializer(matches, many=True, context=self.get_serializer_context()).data,
+        })
+
+    @action(detail=True, methods=['get'])
+    def form(self, request, slug=None):
+        """Last results of the team, most recent first; ?n= sets how many (default 5, at most 20)."""
+        team = get_object_or_404(Team, slug=slug)
+        length = min(parse_positive_int(request.query_params.get('n'), DEFAULT_FORM_LENGTH), MAX_FORM_LENGTH)
+        form = team_forms([team.id], length)[team.id]
+        return Response({
+            'team': team.slug,
+            'form': [entry['result'] for entry in form],
+            'matches': form,
+        })
+
 class PlayerViewSet(viewsets.ModelViewSet):
     queryset = Player.objects.select_related('team').all()
     serializer_class = PlayerSerializer
 
+    @action(detail=False, methods=['get'])
+    def leaderboard(self, request):
+        """Goal leaders of every league, or of one with ?local-league=. Same params as /local-leagues/{slug}/scorers/."""
+        local_league_id = None
+        local_league_slug = request.query_params.get('local-league')
+        if local_league_slug:
+            local_league_id = get_object_or_404(LocalLeague, slug=local_league_slug).id
+        return scorers_response(request, self, local_league_id=local_league_id)
+
 class StadiumViewSet(viewsets.ModelViewSet):
     queryset = Stadium.objects.all()
     serializer_class = StadiumSerializer
 
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Stadiums within ?radius= km (default 10) of ?lat=&lon=, nearest first, with their distance_km."""
+        location = parse_location(request.query_params)
+        if location is None:
+            raise ValidationError({"detail": "The lat and lon query parameters are required."})
+        stadiums = stadiums_nearby(*location, queryset=self.get_queryset().prefetch_related('local_leagues'))
+        data = self.get_serializer(stadiums, many=True).data
+        for row, stadium in zip(data, stadiums):
+            row['distance_km'] = round(stadium.distance_km, 3)
+        return Response(data)
+
 class MatchViewSet(viewsets.ModelViewSet):
-    queryset = Match.objects.select_related('stadium').prefetch_related('participations__team__local_league').all()
+    queryset = Match.objects.select_related('stadium').prefetch_related(
+        # the nested stadium (MatchSerializer depth=1) lists its local leagues
+        'stadium__local_leagues',
+        'participations__team',
+        'participations__events__player',
+    ).all()
     serializer_class = MatchSerializer
 
+    @property
+    def include_standings(self):
+        """Teams are serialized as a compact summary unless standings are requested with ?include=standings."""
+        return 'standings' in self.request.query_params.get('include', '').split(',')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_standings'] = self.include_standings
+        return context
+
     def get_queryset(self):
         queryset = super().get_queryset()
-        local_league_slug = self.request.query_params.get('local-league')
-        if local_league_slug:
-            # Filter matches where participating teams belong to the given league slug
-            # distinct() is important because a match has multiple teams (participations) 
-            # and could return duplicates otherwise.
-            queryset = queryset.filter(participations__team__local_league__slug=local_league_slug).distinct()
+        if self.include_standings:
+            queryset = queryset.prefetch_related('participations__team__local_league', 'participations__team__standings')
+        queryset = parse_match_filters(self.request.query_params).filter(queryset)
+        location = parse_location(self.request.query_params)
+        if location is not None:
+            # matches played in the stadiums near ?lat=&lon=
+            queryset = queryset.filter(stadium__in=[stadium.id for stadium in stadiums_nearby(*location)])
         return queryset
 
+    @action(detail=False, methods=['get'])
+    def live(self, request):
+        """Minimal projection of the matches being played (?local-league= slug), cached for a few seconds."""
+        return Response(live_matches(request.query_params.get('local-league')))
+
+    @action(detail=False, methods=['get'])
+    def upcoming(self, request):
+        """Minimal projection of the next ?limit= scheduled matches (?local-league= slug), cached for a few seconds."""
+        return Response(upcoming_matches(
+            request.query_params.get('local-league'),
+            limit=parse_positive_int(request.query_params.get('limit'), DEFAULT_UPCOMING),
+        ))
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """Events of both teams ordered by minute, each with the running score."""
+        timeline = match_timeline(parse_positive_int(pk))
+        if timeline is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        return Response(timeline)
+
 class MatchEventViewSet(viewsets.ModelViewSet):
     queryset = MatchEvent.objects.all()
     serializer_class = MatchEventSerializer
@@ -126,4 +374,31 @@ class NewsViewSet(viewsets.ModelViewSet):
         local_league_slug = self.request.query_params.get('local-league')
         if local_league_slug:
             queryset = queryset.filter(local_league__slug=local_league_slug)
-        return queryset
\ No newline at end of file
+        return queryset
+
+def calendar_feed(scope, lookup):
+    """
+    Builds the view serving an iCalendar feed. lookup(**url_kwargs) returns the (id, name) of the feed object.
+    The strong ETag is the version of the cache scope of the object, so an unchanged feed costs a single
+    lookup query and is answered with 304 Not Modified, or served from the cached body.
+    """
+    def etag(request, **kwargs):
+        request.calendar_feed = lookup(**kwargs)
+        return feed_etag(scope, request.calendar_feed[0]) if request.calendar_feed else None
+
+    @require_safe
+    @condition(etag_func=etag)
+    def view(request, **kwargs):
+        if not request.calendar_feed:
+            raise Http404
+        key, name = request.calendar_feed
+        response = HttpResponse(feed_body(scope, key, name), content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = f'inline; filename="{scope}-{key}.ics"'
+        # calendar clients must revalidate with the ETag
+        response['Cache-Control'] = 'no-cache'
+        return response
+    return view
+
+league_calendar = calendar_feed('league', lambda slug: LocalLeague.objects.filter(slug=slug).values_list('id', 'name').first())
+team_calendar = calendar_feed('team', lambda slug: Team.objects.filter(slug=slug).values_list('id', 'name').first())
+stadium_calendar = calendar_feed('stadium', lambda pk: Stadium.objects.filter(pk=pk).values_list('id', 'name').first())
@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.utils import timezone
+
+from matches.filters import filter_matches
+from matches.models import Match, MatchEvent, News
+from player_registration.models import MedicalCertificate, PasswordResetRequest
+
+
+def hot_queries():
+    """The hot lookups of both apps and the index each one is expected to use."""
+    today = timezone.localdate()
+    return [
+        ("matches list ?local-league= (semi-join on the participation indexes)", filter_matches(Match.objects.all(), local_league='league')),
+        ("matches list ?stage= (match_stage_datetime_idx)", filter_matches(Match.objects.all(), stage='Gironi')),
+        ("live matches (match_live_idx)", Match.objects.filter(status='LIVE').order_by('datetime')),
+        ("upcoming matches (match_scheduled_idx)", Match.objects.filter(status='SCHEDULED', datetime__gte=timezone.now()).order_by('datetime')[:10]),
+        ("goals of a participation (event_team_match_type_idx)", MatchEvent.objects.filter(team_match=1, event_type='GOAL').values('team_match').annotate(count=Count('pk'))),
+        ("news of a league (news_league_date_idx)", News.objects.filter(local_league=1)),
+        ("pending password resets of an email (pwreset_user_unused_idx, auth_user_email_idx)", PasswordResetRequest.objects.filter(user__email='player@example.com', used_at__isnull=True)),
+        ("user by email (auth_user_email_idx)", User.objects.filter(email='player@example.com')),
+        ("expired medical certificates (medcert_expires_at_idx)", MedicalCertificate.objects.filter(expires_at__lt=today)),
+    ]
+
+
+class Command(BaseCommand):
+    help = "Prints the query plan of the hot lookups of the matches and registration apps, to check which index each one uses."
+
+    def handle(self, *args, **options):
+        for label, queryset in hot_queries():
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(queryset.explain())
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('player_registration', '0034_medicalcertificate_is_verified'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicalcertificate',
+            index=models.Index(fields=['expires_at'], name='medcert_expires_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='passwordresetrequest',
+            index=models.Index(condition=models.Q(('used_at__isnull', True)), fields=['user'], name='pwreset_user_unused_idx'),
+        ),
+        # the registration and password reset serializers look users up by email,
+        # which the auth app does not index (the User model belongs to django.contrib.auth)
+        migrations.RunSQL(
+            'CREATE INDEX auth_user_email_idx ON auth_user (email);',
+            reverse_sql='DROP INDEX auth_user_email_idx;',
+        ),
+    ]
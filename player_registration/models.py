@@ -201,6 +201,12 @@ class PasswordResetRequest(models.Model):
     expires_at = models.DateTimeField("Expires at")
     used_at = models.DateTimeField("Used at", null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # the pending requests of a user, looked up when a reset token is redeemed
+            models.Index(fields=['user'], condition=models.Q(used_at__isnull=True), name='pwreset_user_unused_idx'),
+        ]
+
     #add a computed field to check if the token is used
     @property
     def used(self):
@@ -320,6 +326,11 @@ class MedicalCertificate(models.Model):
     file = models.FileField("Medical certificate file", upload_to='medical_certificates/', storage=PrivateMediaStorage(),
                             validators=[FileExtensionValidator(allowed_extensions=['pdf', 'jpg', 'jpeg', 'png'])])
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='medcert_expires_at_idx'),
+        ]
+
     def __str__(self):
         return f"Medical Certificate for {self.player.user.email} uploaded at {self.uploaded_at}"
     